@@ -1,42 +1,194 @@
 #!/usr/bin/env python3
 from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-import subprocess
+import hashlib
+import json
+import os
 import sys
+import threading
+import time
+from typing import Iterable, Iterator
+
+# unlz.py je vedle v spellcross-master-pytools
+PYTOOLS_DIR = Path(__file__).resolve().parent.parent / "spellcross-master-pytools"
+if PYTOOLS_DIR.is_dir():
+    sys.path.insert(0, str(PYTOOLS_DIR))
+
+import unlz
+
+# every .LZ already decompressed (size, mtime, hash) and its output, kept in the root folder;
+# an .LZ whose size and mtime match its entry is skipped without looking at its output
+MANIFEST_NAME = ".delz_manifest.json"
+
+
+def content_hash(path: Path) -> str:
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+def decompress_file(src: Path, dst: Path) -> tuple[int, int, float]:
+    """
+    Decompress one LZ file, the output is written atomically (temp file + rename).
+    Returns (input bytes, output bytes, seconds). Runs in a worker process.
+    """
+    t0 = time.perf_counter()
+    data = src.read_bytes()
+    out = unlz.unpack_bytes(data)
+
+    tmp = dst.with_name(dst.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(out)
+    os.replace(tmp, dst)
+
+    return len(data), len(out), time.perf_counter() - t0
+
+
+def run_jobs(
+    jobs: Iterable[tuple[Path, Path]],
+    workers: int | None = None,
+    cancel: threading.Event | None = None,
+) -> Iterator[tuple[Path, Path, tuple[int, int, float] | None, Exception | None]]:
+    """
+    Decompress (src, dst) pairs across a process pool, largest inputs first
+    so one big file doesn't end up alone at the tail.
+    Yields (src, dst, result, error) as files finish; error is None on success.
+    Once cancel is set, files not started yet are dropped.
+    """
+    jobs = sorted(jobs, key=lambda job: job[0].stat().st_size, reverse=True)
+    if not jobs:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {ex.submit(decompress_file, src, dst): (src, dst) for src, dst in jobs}
+        try:
+            for fut in as_completed(futures):
+                src, dst = futures[fut]
+                try:
+                    yield src, dst, fut.result(), None
+                except Exception as e:
+                    yield src, dst, None, e
+
+                if cancel is not None and cancel.is_set():
+                    break
+        finally:
+            for fut in futures:
+                fut.cancel()
+
+
+def load_manifest(root: Path) -> dict[str, dict]:
+    try:
+        with open(root / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(root: Path, manifest: dict[str, dict]) -> None:
+    tmp = root / (MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(tmp, root / MANIFEST_NAME)
+
+
+def output_ok(out: Path, size: int) -> bool:
+    try:
+        return out.stat().st_size == size
+    except OSError:
+        return False
 
-# === UPRAV TADY: cesta k delz.exe ===
-DELZ_EXE = r"Z:\Games\Spellcross\Spellcross - utility\spell_delz\spell_delz.exe"
 
 def main():
     root = Path(sys.argv[1] if len(sys.argv) > 1 else ".").resolve()
     lzs = sorted(root.rglob("*.LZ"))
-    if not lzs:
-        print("No .LZ files found")
-        return
-
-    # kontrola, že delz existuje
-    if not Path(DELZ_EXE).exists():
-        raise FileNotFoundError(f"delz.exe not found: {DELZ_EXE}")
+    manifest = load_manifest(root)
 
     ok = 0
     skip = 0
     fail = 0
+    removed = 0
+
+    # outputs of .LZ files that are gone
+    keys = {lz.relative_to(root).as_posix() for lz in lzs}
+    for key in [key for key in manifest if key not in keys]:
+        entry = manifest.pop(key)
+        # only outputs this tool wrote, not ones adopted from e.g. spell_delz.exe
+        if isinstance(entry, dict) and "out" in entry and not entry.get("adopted"):
+            (root / entry["out"]).unlink(missing_ok=True)
+            print(f"[DEL] {entry['out']}")
+            removed += 1
+
+    if not lzs:
+        print("No .LZ files found")
+        save_manifest(root, manifest)
+        return
 
+    jobs = []
     for lz in lzs:
+        key = lz.relative_to(root).as_posix()
+        st = lz.stat()
         out = lz.with_suffix(".bin")
-        if out.exists() and out.stat().st_size > 0:
+        entry = manifest.get(key)
+        if isinstance(entry, dict):
+            # same .LZ as last time -> trust the manifest, its .bin isn't stat'ed
+            if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                skip += 1
+                continue
+
+            # touched but not changed, and its .bin is still there
+            if (entry["size"] == st.st_size and output_ok(out, entry["out_size"])
+                    and entry["hash"] == content_hash(lz)):
+                entry["mtime_ns"] = st.st_mtime_ns
+                skip += 1
+                continue
+
+        # not tracked yet (first run / old manifest) but its .bin is there,
+        # e.g. made by spell_delz.exe -> adopt it instead of decoding again
+        if not isinstance(entry, dict) and out.exists() and out.stat().st_size > 0:
+            manifest[key] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "hash": content_hash(lz),
+                "out": out.relative_to(root).as_posix(),
+                "out_size": out.stat().st_size,
+                "adopted": True,
+            }
             skip += 1
             continue
 
-        try:
-            subprocess.check_call([DELZ_EXE, str(lz), str(out)])
+        manifest.pop(key, None)
+        jobs.append((lz, out))
+
+    t0 = time.perf_counter()
+    total_in = 0
+    total_out = 0
+
+    try:
+        for lz, out, res, err in run_jobs(jobs):
+            if err is not None:
+                fail += 1
+                print(f"[FAIL] {lz}: {err}")
+                continue
+
+            n_in, n_out, dt = res
+            total_in += n_in
+            total_out += n_out
+            st = lz.stat()
+            manifest[lz.relative_to(root).as_posix()] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "hash": content_hash(lz),
+                "out": out.relative_to(root).as_posix(),
+                "out_size": n_out,
+            }
             ok += 1
-            print(f"[OK] {lz.name} -> {out.name}")
-        except Exception as e:
-            fail += 1
-            print(f"[FAIL] {lz}: {e}")
+            print(f"[OK] {lz.name} -> {out.name}  ({n_out / max(dt, 1e-6) / 1e6:.1f} MB/s)")
+    finally:
+        save_manifest(root, manifest)
 
-    print(f"\nDone. ok={ok} skip={skip} fail={fail}  (root={root})")
+    dt = time.perf_counter() - t0
+    print(f"\nDone. ok={ok} skip={skip} fail={fail} removed={removed}  (root={root})")
+    if ok:
+        print(f"{total_in} -> {total_out} bytes in {dt:.2f} s ({total_out / max(dt, 1e-6) / 1e6:.1f} MB/s)")
 
 if __name__ == "__main__":
     main()
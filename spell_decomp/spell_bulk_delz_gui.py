@@ -12,6 +12,8 @@ Features:
     1) spell_delz.exe <input> <output>
     2) spell_delz.exe <input>   (with cwd=destination)
   If style (1) fails, it automatically falls back to style (2).
+- Or, without the EXE, the built-in Python decoder (bulk_delz.py + unlz.py),
+  which decompresses in-process across all CPU cores, largest files first.
 
 Requirements: Python 3.x with tkinter
 Usage: python spell_delz_gui.py
@@ -24,10 +26,16 @@ import sys
 import threading
 import queue
 import subprocess
+import time
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+try:
+    import bulk_delz
+except ImportError:
+    bulk_delz = None
+
 APP_TITLE = "Spellcross LZ Decompressor (spell_delz.exe wrapper)"
 
 def guess_exe_path() -> Path | None:
@@ -57,8 +65,9 @@ def derive_output_name(inp: Path) -> str:
     # unknown extension: append .bin
     return name + ".bin"
 
-def unique_target_path(dst: Path) -> Path:
-    if not dst.exists():
+def unique_target_path(dst: Path, taken: set[Path] | None = None) -> Path:
+    taken = taken or set()
+    if not dst.exists() and dst not in taken:
         return dst
     stem = dst.stem
     suffix = dst.suffix
@@ -66,7 +75,7 @@ def unique_target_path(dst: Path) -> Path:
     i = 1
     while True:
         cand = parent / f"{stem}_{i}{suffix}"
-        if not cand.exists():
+        if not cand.exists() and cand not in taken:
             return cand
         i += 1
 
@@ -79,6 +88,7 @@ class App(tk.Tk):
         self.exe_path = tk.StringVar(value=str(guess_exe_path() or "spell_delz.exe"))
         self.dest_dir = tk.StringVar(value=str(Path.cwd()))
         self.overwrite = tk.BooleanVar(value=False)
+        self.use_builtin = tk.BooleanVar(value=bulk_delz is not None)
 
         self._work_thread: threading.Thread | None = None
         self._cancel_flag = threading.Event()
@@ -113,6 +123,12 @@ class App(tk.Tk):
         opt_row = ttk.Frame(top)
         opt_row.pack(fill="x", pady=(8, 0))
         ttk.Checkbutton(opt_row, text="Overwrite existing files", variable=self.overwrite).pack(side="left")
+        ttk.Checkbutton(
+            opt_row,
+            text="Use built-in Python decoder (parallel, no EXE needed)",
+            variable=self.use_builtin,
+            state=("normal" if bulk_delz is not None else "disabled"),
+        ).pack(side="left", padx=(16, 0))
 
         mid = ttk.Frame(self)
         mid.pack(fill="both", expand=True, **pad)
@@ -226,7 +242,7 @@ class App(tk.Tk):
     # ---------------- Run ----------------
     def _validate(self) -> tuple[Path, Path] | None:
         exe = Path(self.exe_path.get()).expanduser()
-        if not exe.is_file():
+        if not self.use_builtin.get() and not exe.is_file():
             messagebox.showerror(APP_TITLE, f"Decompressor not found:\n{exe}")
             return None
         dest = Path(self.dest_dir.get()).expanduser()
@@ -274,6 +290,11 @@ class App(tk.Tk):
         self.progress.configure(maximum=max(1, len(items)))
         self.progress.configure(value=0)
 
+        if self.use_builtin.get():
+            self._work_thread = threading.Thread(target=self._run_builtin, args=(items, dest), daemon=True)
+            self._work_thread.start()
+            return
+
         def run():
             ok = 0
             fail = 0
@@ -328,6 +349,63 @@ class App(tk.Tk):
         self._work_thread = threading.Thread(target=run, daemon=True)
         self._work_thread.start()
 
+    def _run_builtin(self, items: list[Path], dest: Path) -> None:
+        ok = 0
+        fail = 0
+        jobs = []
+        taken: set[Path] = set()
+        writer: dict[Path, Path] = {}   # output -> input that writes it
+        clashes = []
+
+        for inp in items:
+            inp = inp.expanduser()
+            if not inp.is_file():
+                self._log(f"SKIP (missing): {inp}")
+                fail += 1
+                continue
+
+            out_path = dest / derive_output_name(inp)
+            if not self.overwrite.get():
+                # outputs of the files still in flight count as existing too
+                out_path = unique_target_path(out_path, taken)
+            elif out_path in taken:
+                # two workers would write the same <out>.tmp at once
+                clashes.append((out_path, writer[out_path], inp))
+                continue
+            taken.add(out_path)
+            writer[out_path] = inp
+            jobs.append((inp, out_path))
+
+        if clashes:
+            for out_path, first, inp in clashes:
+                self._log(f"FAIL: {out_path.name} would be written by both {first} and {inp}")
+            self._log("Nothing decompressed, rename the inputs or turn overwrite off.")
+            self.after(0, lambda: self._set_running(False))
+            return
+
+        self._update_progress(fail)
+        done = fail
+        total_out = 0
+        t0 = time.perf_counter()
+
+        for inp, out_path, res, err in bulk_delz.run_jobs(jobs, cancel=self._cancel_flag):
+            done += 1
+            if err is not None:
+                fail += 1
+                self._log(f"[{done}/{len(items)}] FAIL: {inp.name}: {err}")
+            else:
+                ok += 1
+                _, n_out, dt = res
+                total_out += n_out
+                self._log(f"[{done}/{len(items)}] {inp.name} -> {out_path.name}  ({n_out / max(dt, 1e-6) / 1e6:.1f} MB/s)")
+            self._update_progress(done)
+
+        if self._cancel_flag.is_set():
+            self._log("Canceled.")
+        dt = time.perf_counter() - t0
+        self._log(f"Done. Success: {ok}, Failed: {fail}. {total_out / max(dt, 1e-6) / 1e6:.1f} MB/s overall.")
+        self.after(0, lambda: self._set_running(False))
+
     def _run_proc(self, exe: Path, args: list[str], cwd: Path) -> tuple[int, str]:
         try:
             proc = subprocess.run(
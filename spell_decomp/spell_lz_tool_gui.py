@@ -5,6 +5,8 @@ Spellcross LZ tool GUI wrapper
 
 - Uses spell_delz.exe to decompress .LZ and .LZ0 files
 - Uses spell_mklz.exe to compress files back to .LZ (or chosen extension)
+- Or, without any EXE, the built-in Python codec (unlz.py / mklz.py from
+  ../spellcross-master-pytools), which runs in-process
 
 Designed to be a simple front-end for batch operations.
 
@@ -19,6 +21,7 @@ from __future__ import annotations
 
 import os
 import sys
+import struct
 import threading
 import subprocess
 from dataclasses import dataclass
@@ -28,6 +31,18 @@ from typing import List, Optional, Tuple
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+# Built-in codec lives next to the other Python tools
+PYTOOLS_DIR = Path(__file__).resolve().parent.parent / "spellcross-master-pytools"
+if PYTOOLS_DIR.is_dir():
+    sys.path.insert(0, str(PYTOOLS_DIR))
+
+try:
+    import mklz
+    import unlz
+except ImportError:
+    mklz = None
+    unlz = None
+
 
 APP_TITLE = "Spellcross LZ Tool (GUI wrapper)"
 DEFAULT_OUT_SUFFIX_COMP = ".LZ"  # default for compression output
@@ -77,6 +92,7 @@ class App(tk.Tk):
         # Paths to tools (default: alongside script)
         self.delz_path = tk.StringVar(value=str(resource_path("spell_delz.exe")))
         self.mklz_path = tk.StringVar(value=str(resource_path("spell_mklz.exe")))
+        self.use_builtin = tk.BooleanVar(value=mklz is not None)
 
         self.mode = tk.StringVar(value="decompress")  # "decompress" | "compress"
         self.out_dir = tk.StringVar(value=str(Path.cwd()))
@@ -105,6 +121,13 @@ class App(tk.Tk):
         ttk.Entry(tools, textvariable=self.mklz_path).grid(row=1, column=1, sticky="ew", padx=8, pady=6)
         ttk.Button(tools, text="Browse…", command=self._browse_mklz).grid(row=1, column=2, padx=8, pady=6)
 
+        ttk.Checkbutton(
+            tools,
+            text="Use built-in Python codec (no EXE needed)",
+            variable=self.use_builtin,
+            state=("normal" if mklz is not None else "disabled"),
+        ).grid(row=2, column=0, columnspan=3, sticky="w", padx=8, pady=6)
+
         opts = ttk.LabelFrame(self, text="Operation")
         opts.pack(fill="x", **pad)
         opts.columnconfigure(3, weight=1)
@@ -257,13 +280,14 @@ class App(tk.Tk):
         if not out_dir.exists() or not out_dir.is_dir():
             return False, "Output folder is invalid."
 
+        builtin = bool(self.use_builtin.get())
         if self.mode.get() == "decompress":
             tool = Path(self.delz_path.get())
-            if not tool.exists():
+            if not builtin and not tool.exists():
                 return False, "spell_delz.exe not found. Please set the correct path."
         else:
             tool = Path(self.mklz_path.get())
-            if not tool.exists():
+            if not builtin and not tool.exists():
                 return False, "spell_mklz.exe not found. Please set the correct path."
             ext = self.out_ext.get().strip()
             if not ext:
@@ -323,7 +347,9 @@ class App(tk.Tk):
         self.btn_cancel.configure(state="normal")
         self._append_log(f"=== START ({self.mode.get()}) | {len(jobs)} file(s) ===")
 
-        self._worker_thread = threading.Thread(target=self._worker, args=(jobs,), daemon=True)
+        self._worker_thread = threading.Thread(
+            target=self._worker, args=(jobs, bool(self.use_builtin.get())), daemon=True
+        )
         self._worker_thread.start()
 
     def _cancel_run(self) -> None:
@@ -331,7 +357,7 @@ class App(tk.Tk):
             self._cancel.set()
             self._append_log("Cancel requested… (will stop after current file)")
 
-    def _worker(self, jobs: List[Job]) -> None:
+    def _worker(self, jobs: List[Job], builtin: bool) -> None:
         errors = 0
         done = 0
 
@@ -341,7 +367,7 @@ class App(tk.Tk):
 
             try:
                 job.output_path.parent.mkdir(parents=True, exist_ok=True)
-                rc, out = self._run_job(job)
+                rc, out = self._run_builtin_job(job) if builtin else self._run_job(job)
                 if rc != 0:
                     errors += 1
                     self._ui_log(f"[ERR] {job.input_path.name} -> rc={rc}\n{(out or '').strip()}\n")
@@ -370,6 +396,19 @@ class App(tk.Tk):
         )
         return proc.returncode, proc.stdout or ""
 
+    def _run_builtin_job(self, job: Job) -> Tuple[int, str]:
+        data = job.input_path.read_bytes()
+        try:
+            if job.mode == "decompress":
+                out = unlz.unpack_bytes(data)
+            else:
+                out = mklz.pack_bytes(data)
+        except (ValueError, struct.error) as e:
+            return 1, str(e)
+
+        job.output_path.write_bytes(out)
+        return 0, ""
+
     def _ui_progress(self, value: int) -> None:
         self.after(0, lambda: self.progress.configure(value=value))
 
@@ -39,6 +39,16 @@ try:
 except Exception:
     Image = None
 
+# Palette matching (spellimg) lives next to the other Python tools
+PYTOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "spellcross-master-pytools")
+if os.path.isdir(PYTOOLS_DIR):
+    sys.path.insert(0, PYTOOLS_DIR)
+
+try:
+    from spellimg.palmatch import PaletteIndex
+except Exception:
+    PaletteIndex = None
+
 
 # -----------------------------
 # Utilities
@@ -663,12 +673,35 @@ def _expand_palette_to_256(pal_rgb: bytes) -> Optional[bytes]:
         return bytes(out[:768])
     return None
 
+# palette index per asset folder, every .PAL in it is loaded once
+_PALETTE_INDEXES: Dict[str, Any] = {}
+
+def _match_palette_for(path: str) -> Optional[bytes]:
+    """
+    Best scoring .PAL from the asset's folder and its parent (spellimg.palmatch),
+    only if it clearly fits: covers all used indices and the image comes out smooth.
+    """
+    if PaletteIndex is None:
+        return None
+    folder = os.path.dirname(os.path.abspath(path))
+    index = _PALETTE_INDEXES.get(folder)
+    if index is None:
+        index = _PALETTE_INDEXES[folder] = PaletteIndex.from_dirs([folder, os.path.dirname(folder)], recursive=False)
+    try:
+        best = index.match_indices(read_file(path), k=1)
+    except Exception:
+        return None
+    if best and best[0].coverage >= 0.99 and best[0].error < 0.5:
+        return load_palette_file(str(best[0].path))
+    return None
+
 def _try_auto_palette_for(path: str, ui_palette_path: Optional[str]) -> Optional[bytes]:
     """
     Palette selection priority:
       1) palette picked in UI
       2) sibling palette with same basename: <name>.PAL / <name>.pal
-      3) fallback: SYSTEM.PAL in same folder
+      3) best matching palette from the folder / parent folder (_match_palette_for)
+      4) fallback: SYSTEM.PAL in same folder
     Returns palette in original size (96/192/768), not expanded.
     """
     if ui_palette_path:
@@ -682,6 +715,9 @@ def _try_auto_palette_for(path: str, ui_palette_path: Optional[str]) -> Optional
             pal = load_palette_file(p)
             if pal:
                 return pal
+    pal = _match_palette_for(path)
+    if pal:
+        return pal
     sys_pal = os.path.join(os.path.dirname(path), "SYSTEM.PAL")
     if os.path.isfile(sys_pal):
         pal = load_palette_file(sys_pal)
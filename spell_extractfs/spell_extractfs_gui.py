@@ -9,6 +9,9 @@ Features:
 - Choose destination folder (the extractor is executed with cwd=destination)
 - Optional: extract each archive into its own subfolder (avoids collisions)
 - Live log + progress, cancel between files
+- Or, without the EXE, the built-in Python extractor (unfs.py from
+  ../spellcross-master-pytools), which extracts several archives in parallel
+  and shows bytes/sec
 
 Requirements: Python 3.x (tkinter included on most Windows installs)
 Usage: python spell_extractfs_gui.py
@@ -21,10 +24,22 @@ import sys
 import threading
 import queue
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+# Built-in extractor lives next to the other Python tools
+PYTOOLS_DIR = Path(__file__).resolve().parent.parent / "spellcross-master-pytools"
+if PYTOOLS_DIR.is_dir():
+    sys.path.insert(0, str(PYTOOLS_DIR))
+
+try:
+    import unfs
+except ImportError:
+    unfs = None
+
 APP_TITLE = "Spellcross FS Extractor (GUI wrapper)"
 
 def guess_exe_path() -> Path | None:
@@ -53,6 +68,9 @@ class App(tk.Tk):
         self.exe_path = tk.StringVar(value=str(guess_exe_path() or "spell_extractfs.exe"))
         self.dest_dir = tk.StringVar(value=str(Path.cwd()))
         self.make_subfolders = tk.BooleanVar(value=True)
+        self.use_builtin = tk.BooleanVar(value=unfs is not None)
+        self.incremental = tk.BooleanVar(value=True)
+        self.rate_text = tk.StringVar(value="")
 
         self._work_thread: threading.Thread | None = None
         self._cancel_flag = threading.Event()
@@ -92,6 +110,18 @@ class App(tk.Tk):
             text="Extract each archive into its own subfolder (recommended)",
             variable=self.make_subfolders
         ).pack(side="left")
+        ttk.Checkbutton(
+            opt_row,
+            text="Use built-in Python extractor (parallel, no EXE needed)",
+            variable=self.use_builtin,
+            state=("normal" if unfs is not None else "disabled"),
+        ).pack(side="left", padx=(16, 0))
+        ttk.Checkbutton(
+            opt_row,
+            text="Only changed files (built-in)",
+            variable=self.incremental,
+            state=("normal" if unfs is not None else "disabled"),
+        ).pack(side="left", padx=(16, 0))
 
         # Middle: file list + buttons
         mid = ttk.Frame(self)
@@ -129,6 +159,7 @@ class App(tk.Tk):
 
         self.progress = ttk.Progressbar(bot, mode="determinate")
         self.progress.pack(fill="x")
+        ttk.Label(bot, textvariable=self.rate_text).pack(anchor="e")
 
         ttk.Label(bot, text="Log:").pack(anchor="w", pady=(8, 0))
         self.txt = tk.Text(bot, height=10, wrap="word")
@@ -209,7 +240,7 @@ class App(tk.Tk):
     # ---------------- Extraction ----------------
     def _validate(self) -> tuple[Path, Path] | None:
         exe = Path(self.exe_path.get()).expanduser()
-        if not exe.is_file():
+        if not self.use_builtin.get() and not exe.is_file():
             messagebox.showerror(APP_TITLE, f"Extractor not found:\n{exe}")
             return None
         dest = Path(self.dest_dir.get()).expanduser()
@@ -256,6 +287,12 @@ class App(tk.Tk):
 
         self.progress.configure(maximum=max(1, len(items)))
         self.progress.configure(value=0)
+        self.rate_text.set("")
+
+        if self.use_builtin.get():
+            self._work_thread = threading.Thread(target=self._run_builtin, args=(items, dest, self.make_subfolders.get(), self.incremental.get()), daemon=True)
+            self._work_thread.start()
+            return
 
         def run():
             ok = 0
@@ -325,7 +362,103 @@ class App(tk.Tk):
         self._work_thread = threading.Thread(target=run, daemon=True)
         self._work_thread.start()
 
-    def _update_progress(self, value: int) -> None:
+    @staticmethod
+    def _out_dir_for(fs_path: Path, dest: Path, subfolders: bool) -> Path:
+        if not subfolders:
+            return dest
+        # smart: pokud extractor stejně tvoří data\<stem>, nevytvářej další <stem>
+        return dest if fs_path.stem.lower() == "data" else dest / fs_path.stem
+
+    def _run_builtin(self, items: list[Path], dest: Path, subfolders: bool, incremental: bool) -> None:
+        ok = 0
+        fail = 0
+        jobs = []
+        for fs_path in items:
+            fs_path = fs_path.expanduser()
+            if not fs_path.is_file():
+                self._log(f"SKIP (missing): {fs_path}")
+                fail += 1
+                continue
+            jobs.append((fs_path, self._out_dir_for(fs_path, dest, subfolders)))
+
+        # progress is in bytes, the archive size is close enough to the payload total
+        total = sum(fs_path.stat().st_size for fs_path, _ in jobs)
+        self.after(0, lambda: self.progress.configure(maximum=max(1, total)))
+
+        lock = threading.Lock()
+        written = 0
+        t0 = time.perf_counter()
+        last_update = 0.0
+
+        def progress(nbytes: int) -> None:
+            nonlocal written, last_update
+            with lock:
+                written += nbytes
+                now = time.perf_counter()
+                if now - last_update < 0.1:
+                    return
+                last_update = now
+                value = written
+            self._update_progress(value, value / max(now - t0, 1e-6))
+
+        # one manifest per output folder, shared by the archives extracted into it
+        manifests = {}
+        if incremental:
+            for _, out_dir in jobs:
+                manifests.setdefault(out_dir, unfs.load_manifest(str(out_dir)))
+
+        def extract_one(fs_path: Path, out_dir: Path) -> int:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            return unfs.extract(
+                str(fs_path), str(out_dir), progress=progress, cancel=self._cancel_flag,
+                manifest=manifests.get(out_dir),
+            )
+
+        def extract_group(group: list[tuple[Path, Path]]) -> tuple[int, int]:
+            # archives sharing a folder go one after another: same-named members
+            # must not be written at once, and extract() reads the other archives'
+            # manifest entries to decide which orphans it may delete
+            done = failed = 0
+            for fs_path, out_dir in group:
+                try:
+                    count = extract_one(fs_path, out_dir)
+                    done += 1
+                    self._log(f"{fs_path.name} -> {out_dir}: {count} file(s)")
+                except Exception as e:
+                    failed += 1
+                    self._log(f"{fs_path.name}: FAIL: {e}")
+            return done, failed
+
+        # largest archives first so the pool doesn't end on one big straggler
+        jobs.sort(key=lambda job: job[0].stat().st_size, reverse=True)
+        groups: dict[Path, list[tuple[Path, Path]]] = {}
+        for job in jobs:
+            groups.setdefault(job[1], []).append(job)
+        batches = list(groups.values())
+        workers = max(1, min(len(batches), os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for fut in as_completed([ex.submit(extract_group, group) for group in batches]):
+                done, failed = fut.result()
+                ok += done
+                fail += failed
+
+        for out_dir, manifest in manifests.items():
+            try:
+                unfs.save_manifest(str(out_dir), manifest)
+            except OSError as e:
+                self._log(f"FAIL save manifest in {out_dir}: {e}")
+
+        dt = time.perf_counter() - t0
+        # unchanged files were skipped, so the bar is filled up at the end
+        self._update_progress(total if not self._cancel_flag.is_set() else written, written / max(dt, 1e-6))
+        if self._cancel_flag.is_set():
+            self._log("Canceled.")
+        self._log(f"Done. Success: {ok}, Failed: {fail}. {written} bytes in {dt:.2f} s.")
+        self.after(0, lambda: self._set_running(False))
+
+    def _update_progress(self, value: int, rate: float | None = None) -> None:
+        if rate is not None:
+            self.after(0, lambda: self.rate_text.set(f"{rate / 1e6:.1f} MB/s"))
         self.after(0, lambda: self.progress.configure(value=value))
 
     def _cancel(self) -> None:
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing of the spellimg pixel pipeline (spell_rawimg_tool_v4) against the
+original per-pixel loops, on a random 640x480 screen. Also checks that
+both produce the same bytes / PNG.
+"""
+from __future__ import annotations
+
+import io
+import os
+import time
+from typing import Callable, List
+
+from PIL import Image
+
+import spellimg
+
+
+# --- the original pure Python versions, for reference ---
+
+def unpack_packed4_loop(buf: bytes, swap_nibbles: bool = False) -> bytes:
+    out = bytearray(len(buf) * 2)
+    j = 0
+    for b in buf:
+        hi = (b >> 4) & 0x0F
+        lo = b & 0x0F
+        if swap_nibbles:
+            hi, lo = lo, hi
+        out[j] = hi
+        out[j + 1] = lo
+        j += 2
+    return bytes(out)
+
+
+def reorder_colmajor_to_rowmajor_loop(idx: bytes, w: int, h: int) -> bytes:
+    out = bytearray(w * h)
+    for x in range(w):
+        col_off = x * h
+        for y in range(h):
+            out[y * w + x] = idx[col_off + y]
+    return bytes(out)
+
+
+def apply_transparency_loop(im: Image.Image, trans: List[int]) -> Image.Image:
+    rgba = im.convert("RGBA")
+    px = rgba.load()
+    ww, hh = im.size
+    idx_bytes = im.tobytes()
+    for y in range(hh):
+        row = y * ww
+        for x in range(ww):
+            if idx_bytes[row + x] in trans:
+                r, g, b, _a = px[x, y]
+                px[x, y] = (r, g, b, 0)
+    return rgba
+
+
+def best_of(fn: Callable, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def png_bytes(im: Image.Image) -> bytes:
+    f = io.BytesIO()
+    im.save(f, format="PNG")
+    return f.getvalue()
+
+
+def main() -> int:
+    w, h = 640, 480
+    raw = os.urandom(w * h // 2)
+    pal = list(os.urandom(768))
+    trans = spellimg.parse_transparent("0,5-9,200")
+
+    stages = []
+
+    for swap in (False, True):
+        assert spellimg.unpack_packed4(raw, swap) == unpack_packed4_loop(raw, swap)
+    idx = spellimg.unpack_packed4(raw)
+    stages.append(("packed4", lambda: unpack_packed4_loop(raw), lambda: spellimg.unpack_packed4(raw)))
+
+    assert spellimg.reorder_colmajor_to_rowmajor(idx, w, h) == reorder_colmajor_to_rowmajor_loop(idx, w, h)
+    stages.append(("colmajor", lambda: reorder_colmajor_to_rowmajor_loop(idx, w, h),
+                   lambda: spellimg.reorder_colmajor_to_rowmajor(idx, w, h)))
+
+    im = Image.frombytes("P", (w, h), os.urandom(w * h))
+    im.putpalette(pal)
+    assert png_bytes(spellimg.apply_transparency(im, trans)) == png_bytes(apply_transparency_loop(im, trans))
+    stages.append(("transparent", lambda: apply_transparency_loop(im, trans),
+                   lambda: spellimg.apply_transparency(im, trans)))
+
+    print(f"{'stage':<12} {'loop ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for name, slow, fast in stages:
+        t_slow = best_of(slow)
+        t_fast = best_of(fast, repeat=20)
+        print(f"{name:<12} {t_slow * 1e3:10.2f} {t_fast * 1e3:10.2f} {t_slow / t_fast:7.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,15 +2,25 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import annotations
+import hashlib
 import json
+import os
+import argparse
+import queue
 import struct
-import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import OrderedDict
 from pathlib import Path
+from typing import Iterable
 import tkinter as tk
 
 from PIL import Image, ImageTk
 import numpy as np
 
+import unlz
+from spellimg import apply_transparency, infer_dims, parse_transparent
+
 ROOT = Path(".")
 
 PAL_FILE = ROOT / "MAINMENU.PAL"
@@ -24,25 +34,25 @@ FILES = {
 
 OUT_PNG = ROOT / "menu_base.png"
 HITBOX_JSON = ROOT / "menu_hitboxes.json"
+# změny od posledního uložení HITBOX_JSON, jeden JSON řádek na operaci
+HITBOX_JOURNAL = ROOT / "menu_hitboxes.journal"
 
 # -----------------------------
-# optional delz support (když máš jen .LZ)
+# .bin nebo .LZ (rozbalí se v procesu přes unlz, bez externího delz)
 # -----------------------------
-def ensure_bin(p: Path) -> Path:
+def read_raw(p: Path) -> bytes:
     if p.exists() and p.suffix.lower() == ".bin":
-        return p
+        return p.read_bytes()
     if p.exists() and p.suffix.lower() == ".lz":
         out = p.with_suffix(".bin")
         if out.exists():
-            return out
-        print(f"[i] delz {p.name} -> {out.name}")
-        subprocess.check_call(["delz", str(p), str(out)])
-        return out
+            return out.read_bytes()
+        return unlz.unpack_bytes(p.read_bytes())
     # když uživatel zadal .bin co neexistuje, zkus .lz
     if p.suffix.lower() == ".bin":
         alt = p.with_suffix(".lz")
         if alt.exists():
-            return ensure_bin(alt)
+            return read_raw(alt)
     raise FileNotFoundError(p)
 
 # -----------------------------
@@ -69,136 +79,405 @@ def imgP_from_raw(raw: bytes, size: tuple[int,int], pal: list[int]) -> Image.Ima
     img.putpalette(pal)
     return img
 
-def to_rgba_key(imgP: Image.Image, key_index: int) -> Image.Image:
-    rgba = imgP.convert("RGBA")
-    data = imgP.tobytes()
-    px = rgba.load()
-    w, h = imgP.size
-    i = 0
-    for y in range(h):
-        for x in range(w):
-            if data[i] == key_index:
-                r, g, b, a = px[x, y]
-                px[x, y] = (r, g, b, 0)
-            i += 1
-    return rgba
+def key_set(keys: int | str | Iterable[int]) -> tuple[int, ...]:
+    """Klíčové indexy: 0, [0, 255] nebo text jako --transparent ("0,5-9;200")."""
+    if isinstance(keys, (int, np.integer)):
+        return (int(keys),)
+    if isinstance(keys, str):
+        return tuple(sorted(parse_transparent(keys)))
+    return tuple(sorted({int(k) for k in keys}))
+
+# vyklíčované vrstvy podle (hash pixelů + palety, rozměr, klíče), LRU
+KEYED_MAX = 32
+_KEYED: OrderedDict[tuple, Image.Image] = OrderedDict()
+
+def to_rgba_key(imgP: Image.Image, key_index: int | str | Iterable[int]) -> Image.Image:
+    """
+    P image -> RGBA, pixely s klíčovým indexem (jedním, víc nebo rozsahy) mají alpha 0.
+    Výsledek je cachovaný (posledních KEYED_MAX vrstev), volající dostane kopii.
+    """
+    keys = key_set(key_index)
+    h = hashlib.blake2b(imgP.tobytes(), digest_size=16)
+    h.update(bytes(imgP.getpalette() or []))
+    cache_key = (h.digest(), imgP.size, keys)
+    rgba = _KEYED.get(cache_key)
+    if rgba is None:
+        rgba = _KEYED[cache_key] = apply_transparency(imgP, list(keys))
+        while len(_KEYED) > KEYED_MAX:
+            _KEYED.popitem(last=False)
+    else:
+        _KEYED.move_to_end(cache_key)
+    return rgba.copy()
+
+def index_histogram(imgP: Image.Image) -> np.ndarray:
+    return np.bincount(np.frombuffer(imgP.tobytes(), dtype=np.uint8), minlength=256)
 
 def most_common_index(imgP: Image.Image) -> int:
-    data = imgP.tobytes()
-    hist = [0]*256
-    for b in data:
-        hist[b] += 1
-    return max(range(256), key=lambda i: hist[i])
+    return int(np.argmax(index_histogram(imgP)))
 
 # -----------------------------
 # choose BG patch dimensions by scoring factor pairs
 # -----------------------------
-def guess_patch_dims(n: int, max_w: int, max_h: int) -> tuple[int,int]:
-    # všechna (w,h) kde w*h=n
-    cands = []
-    for w in range(16, max_w+1):
-        if n % w != 0:
-            continue
-        h = n // w
-        if 16 <= h <= max_h:
-            # skóre: preferuj "rozumné" patch-e (ne pruhy)
-            score = 0.0
-            # penalizuj extrémní pruhy
-            aspect = w / h
-            score += abs(aspect - 1.0) * 30  # patch často bývá cca “panel”
-            if w < 80 or h < 60:
-                score += 50
-            if w > 520 or h > 420:
-                score += 30
-            # preferuj násobky 4/8
-            if w % 8 == 0: score -= 5
-            if h % 8 == 0: score -= 5
-            cands.append((score, w, h))
-
-    if not cands:
+def guess_patch_dims(n: int, max_w: int, max_h: int, data: bytes | None = None) -> tuple[int,int]:
+    # známé rozměry, jinak dělitele n seřazené podle podobnosti sousedních řádků (data)
+    dims = infer_dims(n, data, min_w=16, max_w=max_w, min_h=16, max_h=max_h)
+    if dims is None:
         raise ValueError(f"Cannot factor {n} into dims <= {max_w}x{max_h}")
-    cands.sort(key=lambda x: x[0])
-    return cands[0][1], cands[0][2]
+    return dims
 
 # -----------------------------
 # find best placement of patch inside UI transparency
 # -----------------------------
-def find_best_hole(ui_idx: np.ndarray, key: int, pw: int, ph: int) -> tuple[int,int,float]:
+def hole_sums(ui_idx: np.ndarray, key: int | str | Iterable[int], pw: int, ph: int) -> np.ndarray:
+    """
+    Počet key pixelů (key: index nebo víc klíčů, viz key_set) pod patchem pw x ph
+    pro každé umístění (x,y) najednou.
+    Returns (H-ph+1, W-pw+1) int array, [y, x] = součet obdélníku z integral image.
+    """
+    H, W = ui_idx.shape
+    if pw > W or ph > H:
+        return np.zeros((0, 0), dtype=np.int64)
+    # integral image s nulovým řádkem/sloupcem navíc => žádné okrajové případy
+    if isinstance(key, (int, np.integer)):
+        mask = ui_idx == key
+    else:
+        mask = np.isin(ui_idx, key_set(key))
+    ii = np.zeros((H + 1, W + 1), dtype=np.int64)
+    np.cumsum(np.cumsum(mask, axis=0), axis=1, out=ii[1:, 1:])
+    return ii[ph:, pw:] - ii[:-ph, pw:] - ii[ph:, :-pw] + ii[:-ph, :-pw]
+
+def find_best_holes(ui_idx: np.ndarray, key: int | str | Iterable[int], pw: int, ph: int, k: int = 1) -> list[tuple[int,int,float]]:
+    """
+    Top-k umístění patche, nejlepší první (při shodě dřív v pořadí řádků).
+    Returns [(x, y, ratio_of_key_pixels), ...]
+    """
+    sums = hole_sums(ui_idx, key, pw, ph)
+    if sums.size == 0:
+        return [(0, 0, 0.0)]
+    flat = sums.ravel()
+    k = max(1, min(k, flat.size))
+    if k < flat.size:
+        top = np.argpartition(-flat, k - 1)[:k]
+        # argpartition bere při shodě libovolné prvky, vezmi všechny s hraničním skóre
+        top = np.flatnonzero(flat >= flat[top].min())
+    else:
+        top = np.arange(flat.size)
+    top = top[np.argsort(-flat[top], kind="stable")][:k]
+    total = pw * ph
+    ys, xs = np.divmod(top, sums.shape[1])
+    return [(int(x), int(y), float(flat[i]) / total if total else 0.0)
+            for x, y, i in zip(xs, ys, top)]
+
+def find_best_hole(ui_idx: np.ndarray, key: int | str | Iterable[int], pw: int, ph: int) -> tuple[int,int,float]:
     """
     ui_idx: (H,W) uint8
     key: transparent index
     Returns (x,y,ratio_of_key_pixels) where ratio ~1 means it's mostly "hole"
     """
-    mask = (ui_idx == key).astype(np.int32)
-    ii = mask.cumsum(axis=0).cumsum(axis=1)
-
-    def rect_sum(x, y, w, h):
-        x2 = x + w - 1
-        y2 = y + h - 1
-        A = ii[y2, x2]
-        B = ii[y-1, x2] if y > 0 else 0
-        C = ii[y2, x-1] if x > 0 else 0
-        D = ii[y-1, x-1] if (x > 0 and y > 0) else 0
-        return A - B - C + D
-
-    best_s = -1
-    best_xy = (0, 0)
-    total = pw * ph
+    return find_best_holes(ui_idx, key, pw, ph, k=1)[0]
 
-    H, W = ui_idx.shape
-    for y in range(0, H - ph + 1):
-        for x in range(0, W - pw + 1):
-            s = rect_sum(x, y, pw, ph)
-            if s > best_s:
-                best_s = s
-                best_xy = (x, y)
-
-    ratio = best_s / total if total else 0.0
-    return best_xy[0], best_xy[1], ratio
+def locate_patches(ui_idx: np.ndarray, key: int, sizes: dict[str, tuple[int,int]],
+                   k: int = 1) -> dict[str, list[tuple[int,int,float]]]:
+    """
+    Umístění pro víc patchů/spritů (MAINM_*, MAINMD*) najednou: {jméno: (w,h)} -> {jméno: top-k}.
+    Stejně velké patche se počítají jen jednou.
+    """
+    found: dict[tuple[int,int], list[tuple[int,int,float]]] = {}
+    for pw, ph in sizes.values():
+        if (pw, ph) not in found:
+            found[(pw, ph)] = find_best_holes(ui_idx, key, pw, ph, k)
+    return {name: found[size] for name, size in sizes.items()}
 
 # -----------------------------
-# build base menu (UI fullscreen + BG patch under it)
+# compose screens (UI fullscreen + BG patches under it)
 # -----------------------------
-def build_menu_base() -> Image.Image:
-    if not PAL_FILE.exists():
-        raise FileNotFoundError(PAL_FILE)
-
-    pal = load_pal(PAL_FILE)
-
-    ui_bin = ensure_bin(FILES["ui"])
-    bg_bin = ensure_bin(FILES["bg"])
-
-    ui_raw = ui_bin.read_bytes()
-    if len(ui_raw) != 640 * 480:
-        raise RuntimeError(f"MAINMENU.bin expected 640*480=307200 bytes, got {len(ui_raw)}")
+# screen spec (jedna položka manifestu):
+# {"palette": "MAINMENU.PAL", "ui": "MAINMENU.LZ", "size": [640, 480],   # size volitelně
+#  "key": "0,255",                                                          # volitelně, jinak nejčastější index
+#  "patches": ["MAINM_BG.LZ", {"file": "MAINM_0.LZ", "size": [w, h], "at": [x, y]}]}
+MAIN_MENU = {
+    "palette": PAL_FILE,
+    "ui": FILES["ui"],
+    "patches": [FILES["bg"]],
+}
 
-    uiP = imgP_from_raw(ui_raw, (640, 480), pal)
+def compose_screen(spec: dict, base_dir: Path = ROOT, verbose: bool = False) -> dict:
+    """
+    Returns {"image": RGBA canvas, "ui_key": key, "patches": [{"file", "size", "pos", "hole_ratio", "image"}]}
+    """
+    def path(p) -> Path:
+        return base_dir / p
+
+    pal_path = path(spec["palette"])
+    if not pal_path.exists():
+        raise FileNotFoundError(pal_path)
+    pal = load_pal(pal_path)
+
+    ui_raw = read_raw(path(spec["ui"]))
+    if "size" in spec:
+        W, H = spec["size"]
+    else:
+        dims = infer_dims(len(ui_raw), ui_raw)
+        if dims is None:
+            raise RuntimeError(f"{spec['ui']}: cannot infer size of {len(ui_raw)} bytes, set \"size\"")
+        W, H = dims
+    if len(ui_raw) != W * H:
+        raise RuntimeError(f"{spec['ui']} expected {W}*{H}={W*H} bytes, got {len(ui_raw)}")
+
+    uiP = imgP_from_raw(ui_raw, (W, H), pal)
 
     # transparent key for UI overlay
-    ui_key = most_common_index(uiP)
-    print(f"[i] UI key index={ui_key}, rgb={rgb_of_index(pal, ui_key)}")
+    ui_key = spec.get("key")
+    if ui_key is None:
+        ui_key = most_common_index(uiP)
+        if verbose:
+            print(f"[i] UI key index={ui_key}, rgb={rgb_of_index(pal, ui_key)}")
+    ui_idx = np.frombuffer(ui_raw, dtype=np.uint8).reshape((H, W))
+
+    canvas = Image.new("RGBA", (W, H), (0, 0, 0, 255))
+    patches = []
+    for patch in spec.get("patches", []):
+        if not isinstance(patch, dict):
+            patch = {"file": patch}
+        raw = read_raw(path(patch["file"]))
+
+        # patch dims
+        if "size" in patch:
+            pw, ph = patch["size"]
+        else:
+            pw, ph = guess_patch_dims(len(raw), max_w=W, max_h=H, data=raw)
+            if verbose:
+                print(f"[i] BG patch dims guessed: {pw}x{ph} (bytes={len(raw)})")
+        patchP = imgP_from_raw(raw, (pw, ph), pal)
+
+        # find placement hole
+        if "at" in patch:
+            x, y = patch["at"]
+            ratio = None
+        else:
+            x, y, ratio = find_best_hole(ui_idx, ui_key, pw, ph)
+            if verbose:
+                print(f"[i] BG placement: x={x}, y={y}, hole_ratio={ratio:.3f}")
+
+        rgba = patchP.convert("RGBA")
+        canvas.alpha_composite(rgba, dest=(x, y))
+        patches.append({"file": str(patch["file"]), "size": [pw, ph], "pos": [x, y],
+                        "hole_ratio": ratio, "image": rgba})
 
-    # BG patch dims
-    bg_raw = bg_bin.read_bytes()
-    pw, ph = guess_patch_dims(len(bg_raw), max_w=640, max_h=480)
-    print(f"[i] BG patch dims guessed: {pw}x{ph} (bytes={len(bg_raw)})")
+    canvas.alpha_composite(to_rgba_key(uiP, ui_key), dest=(0, 0))
+    return {"image": canvas, "ui_key": ui_key, "patches": patches}
+
+def build_menu_base() -> Image.Image:
+    return compose_screen(MAIN_MENU, verbose=True)["image"]
 
-    bgP = imgP_from_raw(bg_raw, (pw, ph), pal)
+# -----------------------------
+# batch: všechny obrazovky z manifestu, atlas patchů + JSON s umístěním
+# -----------------------------
+ATLAS_WIDTH = 2048
+
+def pack_atlas(sizes: list[tuple[int,int]], width: int = ATLAS_WIDTH) -> tuple[list[tuple[int,int]], int, int]:
+    """Shelf packing (nejvyšší první). Returns (pozice ve stejném pořadí jako sizes, šířka, výška)."""
+    width = max([width] + [w for w, h in sizes])
+    pos: list[tuple[int,int]] = [(0, 0)] * len(sizes)
+    x = y = shelf_h = used_w = 0
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        w, h = sizes[i]
+        if x + w > width:
+            x, y = 0, y + shelf_h
+            shelf_h = 0
+        pos[i] = (x, y)
+        x += w
+        shelf_h = max(shelf_h, h)
+        used_w = max(used_w, x)
+    return pos, used_w, y + shelf_h
+
+def compose_screen_job(name: str, spec: dict, base_dir: str) -> tuple[str, dict]:
+    return name, compose_screen(spec, Path(base_dir))
+
+def batch(manifest: Path, outdir: Path, jobs: int | None = None) -> int:
+    """
+    manifest: {"screens": {jméno: screen spec}} (cesty relativně k manifestu)
+    Zapíše outdir/<jméno>.png, outdir/atlas.png a outdir/screens.json.
+    """
+    screens = json.loads(manifest.read_text(encoding="utf-8"))["screens"]
+    base_dir = str(manifest.resolve().parent)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    results: dict[str, dict] = {}
+    fail = 0
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        futures = {ex.submit(compose_screen_job, name, spec, base_dir): name for name, spec in screens.items()}
+        for fut in as_completed(futures):
+            try:
+                name, res = fut.result()
+            except Exception as e:
+                print(f"[!] {futures[fut]}: {e}")
+                fail += 1
+                continue
+            res["image"].save(outdir / f"{name}.png")
+            results[name] = res
+            print(f"[OK] {name}.png ({res['image'].size[0]}x{res['image'].size[1]}, {len(res['patches'])} patches)")
+
+    # atlas: každý patch jen jednou, i když ho používá víc obrazovek
+    unique: dict[bytes, int] = {}
+    images: list[Image.Image] = []
+    for name in sorted(results):
+        for p in results[name]["patches"]:
+            digest = hashlib.blake2b(p["image"].tobytes(), digest_size=16).digest()
+            digest += bytes(str(p["image"].size), "ascii")
+            if digest not in unique:
+                unique[digest] = len(images)
+                images.append(p["image"])
+            p["atlas_index"] = unique[digest]
+    pos, aw, ah = pack_atlas([im.size for im in images])
+    atlas = Image.new("RGBA", (max(1, aw), max(1, ah)), (0, 0, 0, 0))
+    for im, xy in zip(images, pos):
+        atlas.paste(im, xy)
+    atlas.save(outdir / "atlas.png")
+
+    out = {"atlas": "atlas.png", "screens": {}}
+    for name in sorted(results):
+        res = results[name]
+        patches = []
+        for p in res["patches"]:
+            ax, ay = pos[p["atlas_index"]]
+            patches.append({"file": p["file"], "size": p["size"], "pos": p["pos"],
+                            "hole_ratio": p["hole_ratio"], "atlas": [ax, ay] + p["size"]})
+        out["screens"][name] = {"image": f"{name}.png", "size": list(res["image"].size),
+                                "ui_key": res["ui_key"], "patches": patches}
+    (outdir / "screens.json").write_text(json.dumps(out, indent=2), encoding="utf-8")
+    print(f"[OK] atlas.png ({aw}x{ah}, {len(images)} patches), screens.json, {fail} failed")
+    return 1 if fail else 0
 
-    # find placement hole
-    ui_idx = np.frombuffer(ui_raw, dtype=np.uint8).reshape((480, 640))
-    x, y, ratio = find_best_hole(ui_idx, ui_key, pw, ph)
-    print(f"[i] BG placement: x={x}, y={y}, hole_ratio={ratio:.3f}")
+# -----------------------------
+# hitbox persistence (journal + compaction mimo UI thread)
+# -----------------------------
+def apply_hitbox_op(hitboxes: list, op: dict) -> None:
+    """
+    {"op": "add", "i": i, "hb": {...}} -> hitboxes[i:] = [hb]
+    {"op": "truncate", "n": n}         -> del hitboxes[n:]
+    Obě popisují výsledný stav (ne změnu), takže přehrát journal znovu
+    na už uložený JSON dá stejný výsledek.
+    """
+    if op["op"] == "add":
+        del hitboxes[op["i"]:]
+        hitboxes.append(op["hb"])
+    elif op["op"] == "truncate":
+        del hitboxes[op["n"]:]
 
-    # composite
-    canvas = Image.new("RGBA", (640, 480), (0, 0, 0, 255))
-    canvas.alpha_composite(bgP.convert("RGBA"), dest=(x, y))
-    canvas.alpha_composite(to_rgba_key(uiP, ui_key), dest=(0, 0))
-    return canvas
+class HitboxStore:
+    """
+    Operace z UI jdou do fronty; writer thread je připisuje do journalu
+    (O(1) zápis na operaci) a po IDLE_SECONDS bez změn nebo při close()
+    zapíše celý JSON atomicky (temp + rename) a journal vyprázdní.
+    """
+    IDLE_SECONDS = 2.0
+
+    def __init__(self, json_path: Path = HITBOX_JSON, journal_path: Path = HITBOX_JOURNAL):
+        self.json_path = json_path
+        self.journal_path = journal_path
+        self.queue: queue.Queue = queue.Queue()
+        self.thread: threading.Thread | None = None
+
+    def load(self) -> list:
+        """JSON + přehrání journalu (když minule nedošlo ke compaction, např. pád).
+
+        Nečitelný JSON se nepřepisuje: odloží se i s journalem jako *.corrupt
+        a začne se s prázdným seznamem.
+        """
+        hitboxes = []
+        if self.json_path.exists():
+            try:
+                hitboxes = json.loads(self.json_path.read_text(encoding="utf-8"))
+            except ValueError as e:
+                corrupt = self.quarantine(self.json_path)
+                print(f"[!] {self.json_path.name} is corrupt ({e}), kept as {corrupt.name}")
+                if self.journal_path.exists():
+                    self.quarantine(self.journal_path)
+        if self.journal_path.exists():
+            for line in self.journal_path.read_text(encoding="utf-8").splitlines():
+                try:
+                    apply_hitbox_op(hitboxes, json.loads(line))
+                except (ValueError, KeyError):
+                    break   # useknutý poslední řádek
+        self.thread = threading.Thread(target=self._writer, args=(list(hitboxes),), daemon=True)
+        self.thread.start()
+        return hitboxes
+
+    @staticmethod
+    def quarantine(path: Path) -> Path:
+        """path -> path.corrupt (.corrupt1, ... když už existuje), vrací nové jméno."""
+        target = path.with_name(path.name + ".corrupt")
+        n = 0
+        while target.exists():
+            n += 1
+            target = path.with_name(f"{path.name}.corrupt{n}")
+        os.replace(path, target)
+        return target
+
+    def add(self, i: int, hb: dict):
+        self.queue.put({"op": "add", "i": i, "hb": dict(hb)})
+
+    def truncate(self, n: int):
+        self.queue.put({"op": "truncate", "n": n})
+
+    def close(self):
+        """Dopíše frontu, uloží JSON a počká na writer thread."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def _writer(self, hitboxes: list):
+        dirty = self.journal_path.exists() and self.journal_path.stat().st_size > 0
+        with open(self.journal_path, "a", encoding="utf-8") as journal:
+            while True:
+                try:
+                    op = self.queue.get(timeout=self.IDLE_SECONDS if dirty else None)
+                except queue.Empty:
+                    op = "idle"
+                if op is None or op == "idle":
+                    if dirty:
+                        self._compact(hitboxes, journal)
+                        dirty = False
+                    if op is None:
+                        return
+                    continue
+                apply_hitbox_op(hitboxes, op)
+                journal.write(json.dumps(op) + "\n")
+                journal.flush()
+                dirty = True
+
+    def _compact(self, hitboxes: list, journal):
+        tmp = self.json_path.with_name(self.json_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(hitboxes, indent=2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.json_path)
+        journal.truncate(0)
 
 # -----------------------------
 # Tk viewer + hitbox editor
 # -----------------------------
+class ZoomPyramid:
+    """
+    Base image v každém zvětšení 1..max_scale. Každá úroveň se zvětší a převede
+    na PhotoImage jen jednou (při prvním použití), pak se jen přepíná.
+    """
+    def __init__(self, base_img: Image.Image, max_scale: int = 6):
+        self.base = base_img
+        self.max_scale = max_scale
+        self.levels: dict[int, ImageTk.PhotoImage] = {}
+
+    def __getitem__(self, scale: int) -> ImageTk.PhotoImage:
+        level = self.levels.get(scale)
+        if level is None:
+            w, h = self.base.size
+            level = self.levels[scale] = ImageTk.PhotoImage(
+                self.base.resize((w*scale, h*scale), Image.NEAREST))
+        return level
+
 class MenuViewer(tk.Tk):
     def __init__(self, base_img: Image.Image):
         super().__init__()
@@ -207,14 +486,23 @@ class MenuViewer(tk.Tk):
         self.base = base_img
         self.scale = 2
         self.show_hitboxes = True
+        self.pyramid = ZoomPyramid(base_img)
 
         w, h = self.base.size
         self.canvas = tk.Canvas(self, width=w*self.scale, height=h*self.scale, bg="black", highlightthickness=0)
         self.canvas.pack(fill="both", expand=True)
 
-        self.tk_img = None
+        # canvas items žijí po celou dobu, mění se jen jejich coords/config
+        # (Tk pak překreslí jen změněnou oblast)
+        self.img_id = self.canvas.create_image(0, 0, anchor="nw", image=self.pyramid[self.scale])
+        self.hud_bg_id = self.canvas.create_rectangle(6, 6, 6 + 320, 6 + 26, fill="black", outline="", tags="hud")
+        self.hud_id = self.canvas.create_text(12, 10, anchor="nw", fill="white", tags="hud")
+
         self.hitboxes = []
+        self.hitbox_items: list[tuple[int,int]] = []   # (rect_id, text_id) pro hitboxes[i]
+        self.store = HitboxStore()
         self.load_hitboxes()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.drag_start = None
         self.drag_rect_id = None
@@ -234,52 +522,72 @@ class MenuViewer(tk.Tk):
         self.redraw()
 
     def redraw(self):
-        img2 = self.base.resize((self.base.size[0]*self.scale, self.base.size[1]*self.scale), Image.NEAREST)
-        self.tk_img = ImageTk.PhotoImage(img2)
-
-        self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor="nw", image=self.tk_img)
-
-        # HUD
+        """Srovná canvas items s self.hitboxes (např. po načtení), existující items jen přesune."""
+        while len(self.hitbox_items) > len(self.hitboxes):
+            self.canvas.delete(*self.hitbox_items.pop())
+        for i, hb in enumerate(self.hitboxes):
+            if i == len(self.hitbox_items):
+                self.add_hitbox_items(hb)
+            else:
+                self.place_hitbox(i)
+        self.update_hud()
+
+    def update_hud(self):
         hud = f"hitboxes: {len(self.hitboxes)} | scale: {self.scale} | show: {self.show_hitboxes}"
-        self.canvas.create_rectangle(6, 6, 6 + 320, 6 + 26, fill="black", outline="")
-        self.canvas.create_text(12, 10, anchor="nw", text=hud, fill="white")
-
-        if self.show_hitboxes:
-            for hb in self.hitboxes:
-                x1, y1, x2, y2 = hb["rect"]
-                self.canvas.create_rectangle(
-                    x1*self.scale, y1*self.scale, x2*self.scale, y2*self.scale,
-                    outline="lime", width=2
-                )
-                self.canvas.create_text(
-                    (x1+4)*self.scale, (y1+4)*self.scale,
-                    anchor="nw", text=hb.get("name",""), fill="lime"
-                )
+        self.canvas.itemconfigure(self.hud_id, text=hud)
+
+    def add_hitbox_items(self, hb: dict):
+        state = "normal" if self.show_hitboxes else "hidden"
+        rect_id = self.canvas.create_rectangle(0, 0, 0, 0, outline="lime", width=2, state=state, tags="hitbox")
+        text_id = self.canvas.create_text(0, 0, anchor="nw", text=hb.get("name",""), fill="lime",
+                                          state=state, tags="hitbox")
+        self.hitbox_items.append((rect_id, text_id))
+        self.place_hitbox(len(self.hitbox_items) - 1)
+        self.canvas.tag_raise("hud")
+
+    def place_hitbox(self, i: int):
+        x1, y1, x2, y2 = self.hitboxes[i]["rect"]
+        rect_id, text_id = self.hitbox_items[i]
+        s = self.scale
+        self.canvas.coords(rect_id, x1*s, y1*s, x2*s, y2*s)
+        self.canvas.coords(text_id, (x1+4)*s, (y1+4)*s)
+        self.canvas.itemconfigure(text_id, text=self.hitboxes[i].get("name",""))
+
+    def set_scale(self, scale: int):
+        scale = max(1, min(self.pyramid.max_scale, scale))
+        if scale == self.scale:
+            return
+        self.scale = scale
+        w, h = self.base.size
+        self.canvas.itemconfigure(self.img_id, image=self.pyramid[scale])
+        self.canvas.config(width=w*scale, height=h*scale)
+        for i in range(len(self.hitbox_items)):
+            self.place_hitbox(i)
+        self.update_hud()
 
     def on_key(self, e):
         k = e.keysym.lower()
 
         if k == "h":
             self.show_hitboxes = not self.show_hitboxes
-            self.redraw()
+            self.canvas.itemconfigure("hitbox", state="normal" if self.show_hitboxes else "hidden")
+            self.update_hud()
             return
 
         if k == "backspace":
             if self.hitboxes:
                 self.hitboxes.pop()
-                self.save_hitboxes()   # auto-save
-                self.redraw()
+                self.canvas.delete(*self.hitbox_items.pop())
+                self.store.truncate(len(self.hitboxes))   # auto-save (journal)
+                self.update_hud()
             return
 
         if k in ("plus", "equal"):
-            self.scale = min(6, self.scale + 1)
-            self.redraw()
+            self.set_scale(self.scale + 1)
             return
 
         if k == "minus":
-            self.scale = max(1, self.scale - 1)
-            self.redraw()
+            self.set_scale(self.scale - 1)
             return
 
     def on_down(self, e):
@@ -316,13 +624,14 @@ class MenuViewer(tk.Tk):
         # ask for name immediately
         name = self.ask_name(default=f"item_{len(self.hitboxes)}")
         self.hitboxes.append({"name": name, "rect": [xa, ya, xb, yb]})
+        self.add_hitbox_items(self.hitboxes[-1])
 
         if self.drag_rect_id:
             self.canvas.delete(self.drag_rect_id)
         self.drag_rect_id = None
 
-        self.save_hitboxes()  # auto-save
-        self.redraw()
+        self.store.add(len(self.hitboxes) - 1, self.hitboxes[-1])  # auto-save (journal)
+        self.update_hud()
 
     def ask_name(self, default: str) -> str:
         win = tk.Toplevel(self)
@@ -346,19 +655,26 @@ class MenuViewer(tk.Tk):
         return result["name"]
 
     def load_hitboxes(self):
-        if HITBOX_JSON.exists():
-            try:
-                self.hitboxes = json.loads(HITBOX_JSON.read_text(encoding="utf-8"))
-            except Exception:
-                self.hitboxes = []
+        self.hitboxes = self.store.load()
 
-    def save_hitboxes(self):
-        HITBOX_JSON.write_text(json.dumps(self.hitboxes, indent=2), encoding="utf-8")
+    def on_close(self):
+        self.store.close()   # poslední compaction do HITBOX_JSON
+        self.destroy()
 
 # -----------------------------
 # main
 # -----------------------------
 def main():
+    ap = argparse.ArgumentParser(description="Spellcross menu compositor + hitbox editor")
+    ap.add_argument("-b", "--batch", type=Path, metavar="MANIFEST",
+                    help="compose every screen in a JSON manifest, no viewer")
+    ap.add_argument("-d", "--outdir", type=Path, default=ROOT / "screens")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = ap.parse_args()
+
+    if args.batch:
+        raise SystemExit(batch(args.batch, args.outdir, args.jobs))
+
     base = build_menu_base()
     base.save(OUT_PNG)
     print(f"[OK] {OUT_PNG.name} ({base.size[0]}x{base.size[1]})")
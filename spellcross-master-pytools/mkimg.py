@@ -1,35 +1,170 @@
 #!/usr/bin/env python3
 
 from PIL import Image
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import argparse
+import glob
+import os
 import struct
 import logging
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger('mkimg')
 
-def main(args):
-    w, h = map(int, args.size.split('x'))
+# zlib level of --fast previews
+FAST_COMPRESS_LEVEL = 1
+
+# palettes loaded by the parent, handed to every worker process once
+PALETTES = {}
+
+def load_palette(path):
+    with open(path, 'rb') as f:
+        return list(f.read())
+
+def init_worker(palettes):
+    PALETTES.update(palettes)
+
+def parse_size(size):
+    w, h = map(int, size.split('x'))
+    return w, h
 
-    with open(args.input, 'rb') as f:
+def convert(input, output, size, palette=None, format='PNG', compress_level=6):
+    """ RAW -> image; palette is a *.PAL path looked up in PALETTES
+        (loaded on the spot if it isn't there), grayscale if None.
+    """
+    with open(input, 'rb') as f:
         image = Image.frombytes(
-            'P' if args.palette else 'L',
-            (w, h),            
+            'P' if palette else 'L',
+            size,
             f.read(),
         )
 
-        if args.palette:
-            with open(args.palette, 'rb') as f:
-                image.putpalette(list(f.read()))
+    if palette:
+        if palette not in PALETTES:
+            PALETTES[palette] = load_palette(palette)
+        image.putpalette(PALETTES[palette])
+
+    params = {'compress_level': compress_level} if format.upper() == 'PNG' else {}
+    with open(output, 'wb') as f:
+        image.save(f, format=format, **params)
+
+    return output
+
+def read_manifest(path):
+    """ Lines of 'input size [palette]', blank lines and #comments skipped.
+        Relative paths are relative to the manifest, and so is the path
+        each input keeps under --outdir.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) not in (2, 3):
+                raise ValueError('%s:%d: expected "input size [palette]"' % (path, lineno))
+
+            input = os.path.join(base, fields[0])
+            palette = os.path.join(base, fields[2]) if len(fields) == 3 else None
+            jobs.append((input, parse_size(fields[1]), palette, base))
+    return jobs
+
+def find_inputs(sources, pattern):
+    """ Files named by glob patterns or found (recursively) in directories,
+        as (path, root) pairs; under --outdir a file found in a directory
+        keeps its path relative to that directory.
+    """
+    inputs = []
+    for source in sources:
+        if os.path.isdir(source):
+            found = sorted(glob.glob(os.path.join(source, '**', pattern), recursive=True))
+            inputs += [(path, source) for path in found]
+        else:
+            found = sorted(glob.glob(source, recursive=True))
+            inputs += [(path, os.path.dirname(path)) for path in found]
+    return [(path, root) for path, root in inputs if os.path.isfile(path)]
+
+def output_path(input, outdir, format, root=None):
+    """ Next to the input, or under outdir at the input's path relative to root. """
+    if not outdir:
+        return os.path.splitext(input)[0] + '.' + format.lower()
+    rel = os.path.relpath(input, root) if root is not None else os.path.basename(input)
+    if rel.startswith(os.pardir + os.sep):
+        rel = os.path.basename(input)
+    return os.path.join(outdir, os.path.splitext(rel)[0] + '.' + format.lower())
+
+def batch(args):
+    if args.manifest:
+        jobs = read_manifest(args.manifest)
+    else:
+        size = parse_size(args.size)
+        jobs = [(input, size, args.palette, root) for input, root in find_inputs(args.batch, args.pattern)]
+
+    # two inputs must not end up as the same file
+    outputs = {}
+    for input, _, _, root in jobs:
+        outputs.setdefault(os.path.normpath(output_path(input, args.outdir, args.format, root)), []).append(input)
+    clashes = {output: inputs for output, inputs in outputs.items() if len(inputs) > 1}
+    for output, inputs in sorted(clashes.items()):
+        log.error('%s would be written by %s' % (output, ', '.join(inputs)))
+    if clashes:
+        raise SystemExit(1)
+
+    for output in outputs:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    # each palette is read once, here
+    palettes = {}
+    for _, _, palette, _ in jobs:
+        if palette and palette not in palettes:
+            palettes[palette] = load_palette(palette)
+
+    compress_level = FAST_COMPRESS_LEVEL if args.fast else args.compress_level
+    log.info('%d image(s), %d palette(s)' % (len(jobs), len(palettes)))
+
+    ok = 0
+    fail = 0
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker, initargs=(palettes,)) as ex:
+        futures = {
+            ex.submit(convert, input, output_path(input, args.outdir, args.format, root),
+                size, palette, args.format, compress_level): input
+            for input, size, palette, root in jobs
+        }
+        for fut in as_completed(futures):
+            try:
+                log.debug('%s -> %s' % (futures[fut], fut.result()))
+                ok += 1
+            except Exception as e:
+                log.error('%s: %s' % (futures[fut], e))
+                fail += 1
+
+    log.info('done, %d converted, %d failed' % (ok, fail))
+    if fail:
+        raise SystemExit(1)
+
+def main(args):
+    if args.batch or args.manifest:
+        batch(args)
+        return
 
-    with open(args.output, 'wb') as f:
-        image.save(f, format=args.format)
+    convert(
+        args.input, args.output, parse_size(args.size), args.palette, args.format,
+        FAST_COMPRESS_LEVEL if args.fast else args.compress_level,
+    )
 
 if __name__ == '__main__':
     ap = argparse.ArgumentParser('merge RAW images with palette into PNG')
-    ap.add_argument('-s', '--size', default='640x480', help='image size [%(default)]')
+    ap.add_argument('-s', '--size', default='640x480', help='image size [%(default)s]')
     ap.add_argument('-p', '--palette', default=None, help='*.PAL file (grayscale if omitted)')
-    ap.add_argument('-i', '--input', default='/dev/stdin', help='input [%(default)]')
-    ap.add_argument('-o', '--output', default='/dev/stdout', help='output [%(default)]')
-    ap.add_argument('-f', '--format', default='PNG', help='output format [%(default)]')
+    ap.add_argument('-i', '--input', default='/dev/stdin', help='input [%(default)s]')
+    ap.add_argument('-o', '--output', default='/dev/stdout', help='output [%(default)s]')
+    ap.add_argument('-f', '--format', default='PNG', help='output format [%(default)s]')
+    ap.add_argument('-z', '--compress-level', type=int, default=6, help='PNG zlib level 0-9 [%(default)s]')
+    ap.add_argument('--fast', action='store_true', help='zlib level %d, for previews' % FAST_COMPRESS_LEVEL)
+    ap.add_argument('-b', '--batch', nargs='+', metavar='SOURCE', help='convert all files matching globs or in directories')
+    ap.add_argument('--pattern', default='*.bin', help='files picked from --batch directories [%(default)s]')
+    ap.add_argument('-m', '--manifest', default=None, help='file of "input size [palette]" lines to convert')
+    ap.add_argument('-d', '--outdir', default=None, help='batch output directory, subfolders of a SOURCE directory are kept (next to inputs if omitted)')
+    ap.add_argument('-j', '--jobs', type=int, default=None, help='worker processes [CPU count]')
     main(ap.parse_args())
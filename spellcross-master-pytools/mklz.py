@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import sys
+import struct
+import logging
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger('mklz')
+
+# The decoder in the game (and in the map editor) reads at most 12-bit codes,
+# so the dictionary is cleared before any code would need more.
+MAX_BITS_PER_SYMBOL = 12
+
+# MSB-first bitstream writer
+class BitWriter:
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.bits = 0
+
+    def write(self, value, nbits):
+        self.acc = (self.acc << nbits) | value
+        self.bits += nbits
+        if self.bits >= 32:
+            self.bits -= 32
+            self.out += (self.acc >> self.bits).to_bytes(4, 'big')
+            self.acc &= (1 << self.bits) - 1
+
+    def flush(self):
+        """ Pad the last byte with zero bits and return everything written. """
+        nbytes = (self.bits + 7) // 8
+        self.out += (self.acc << (nbytes * 8 - self.bits)).to_bytes(nbytes, 'big')
+        self.acc = 0
+        self.bits = 0
+        return bytes(self.out)
+
+# Produces exactly the container unlz.iter_unpack reads:
+#   uint16_t = initial dictionary size
+#   uint8_t  = initial bits per symbol
+#   initial dictionary (omitted if it contains all 256 bytes)
+#   LZW codes, dictionary[dict_size] = CLEAR, 2xCLEAR == EOF
+def pack_bytes(data, max_bits_per_symbol=MAX_BITS_PER_SYMBOL):
+    # like spell_mklz, the initial dictionary holds just the byte values used
+    initial = bytes(sorted(set(data)))
+    index = {byte: i for i, byte in enumerate(initial)}
+
+    clear_code = len(initial)
+    first_dynamic = clear_code + 1
+
+    # enough for every initial symbol and the CLEAR
+    clear_bits_per_symbol = 0
+    while (1 << clear_bits_per_symbol) < clear_code + 2:
+        clear_bits_per_symbol += 1
+
+    if (1 << max_bits_per_symbol) < first_dynamic + 2:
+        raise ValueError('%d bits per symbol is not enough for %d initial symbols'
+            % (max_bits_per_symbol, clear_code))
+
+    log.debug('dict_size = %d, bits per symbol = %d' % (clear_code, clear_bits_per_symbol))
+
+    header = struct.pack('<HB', clear_code, clear_bits_per_symbol)
+    if clear_code < 256:
+        header += initial
+
+    bw = BitWriter()
+    bits_per_symbol = clear_bits_per_symbol
+
+    if data:
+        # (prefix code << 8 | next byte) -> code, reset on CLEAR
+        dictionary = {}
+        count = 0
+        # the decoder bumps the width once this many symbols have been added
+        grow_at = (1 << bits_per_symbol) - first_dynamic - 1
+        # clear the dictionary once one more symbol would overflow the width
+        clear_at = (1 << max_bits_per_symbol) - first_dynamic - 2
+
+        prefix = index[data[0]]
+        for byte in memoryview(data)[1:]:
+            key = (prefix << 8) | byte
+            code = dictionary.get(key)
+            if code is not None:
+                prefix = code
+                continue
+
+            bw.write(prefix, bits_per_symbol)
+            dictionary[key] = first_dynamic + count
+            count += 1
+
+            # check if the decoder needs more bits per symbol from now on
+            if count > grow_at:
+                bits_per_symbol += 1
+                grow_at = (1 << bits_per_symbol) - first_dynamic - 1
+
+            if count > clear_at:
+                bw.write(clear_code, bits_per_symbol)
+                dictionary.clear()
+                count = 0
+                bits_per_symbol = clear_bits_per_symbol
+                grow_at = (1 << bits_per_symbol) - first_dynamic - 1
+
+            prefix = index[byte]
+
+        bw.write(prefix, bits_per_symbol)
+
+        # the decoder adds an (incomplete) entry for the last symbol too
+        if count + 1 > grow_at:
+            bits_per_symbol += 1
+
+    # 2xCLEAR == EOF, the second one is read with the reset width
+    bw.write(clear_code, bits_per_symbol)
+    bw.write(clear_code, clear_bits_per_symbol)
+
+    return header + bw.flush()
+
+def pack(f):
+    return pack_bytes(f.read())
+
+if __name__ == '__main__':
+    with open(sys.argv[1], 'rb') as f:
+        sys.stdout.buffer.write(pack(f))
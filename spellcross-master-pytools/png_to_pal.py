@@ -2,44 +2,58 @@
 # screenshot_to_pal_ui.py
 #
 # Simple GUI tool: screenshot (PNG/JPG) -> 256-color .PAL (768 bytes, RGBRGB...)
+# With arguments it runs as a CLI and can build one palette from many screenshots:
+#   png_to_pal.py shot1.png shot2.png -o game.pal --lock 0=000000 --lock-pal MAINMENU.PAL --lock-range 240-255
 #
 # Requirements:
-#   pip install pillow
+#   pip install pillow numpy
 
+import argparse
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from pathlib import Path
 from PIL import Image
 
+from spellimg import ColorHistogram, locked_from_palette, parse_transparent, quantize_histogram, scale_vga6
 
-def build_palette_from_image(img: Image.Image, colors: int = 256, sample_max: int = 1024,
-                             composite_bg=(0, 0, 0)) -> list[int]:
+
+def build_palette_from_images(imgs, colors: int = 256, sample_max: int = 0,
+                              composite_bg=(0, 0, 0), locked=None, iterations: int = 8) -> list[int]:
     """
     Returns palette as list[int] length 768: [r,g,b,r,g,b,...] (256 colors).
-    Uses Pillow adaptive quantization.
+    One 32x32x32 color histogram over all images, median cut + k-means
+    (spellimg.quantize); the result does not depend on the order of imgs.
+    locked: {index: (r, g, b)} entries kept as given.
     """
-    img = img.convert("RGBA")
-
-    # Downsample for speed/stability
-    w, h = img.size
-    scale = min(1.0, sample_max / max(w, h))
-    if scale < 1.0:
-        img = img.resize(
-            (max(1, int(w * scale)), max(1, int(h * scale))),
-            Image.Resampling.LANCZOS
-        )
+    hist = ColorHistogram()
+    for img in imgs:
+        # Downsample for speed/stability (0 = full size)
+        w, h = img.size
+        scale = min(1.0, sample_max / max(w, h)) if sample_max else 1.0
+        if scale < 1.0:
+            img = img.convert("RGBA").resize(
+                (max(1, int(w * scale)), max(1, int(h * scale))),
+                Image.Resampling.LANCZOS
+            )
+        hist.add_image(img, composite_bg)
+    return quantize_histogram(hist, colors, locked, iterations)
+
+
+def build_palette_from_image(img: Image.Image, colors: int = 256, sample_max: int = 1024,
+                             composite_bg=(0, 0, 0), locked=None) -> list[int]:
+    return build_palette_from_images([img], colors, sample_max, composite_bg, locked)
 
-    # Composite alpha over background
-    bg = Image.new("RGBA", img.size, (*composite_bg, 255))
-    img_rgb = Image.alpha_composite(bg, img).convert("RGB")
 
-    # Quantize
-    q = img_rgb.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
-    pal = q.getpalette() or []
-    pal = pal[: 256 * 3]
-    if len(pal) < 256 * 3:
-        pal += [0] * (256 * 3 - len(pal))
-    return pal
+def parse_lock(s: str) -> tuple[int, tuple[int, int, int]]:
+    """'0=000000' or '0=0,0,0' -> (0, (0, 0, 0))"""
+    idx, rgb = s.split("=", 1)
+    rgb = rgb.strip().lstrip("#")
+    if "," in rgb:
+        r, g, b = (int(v) for v in rgb.split(","))
+    else:
+        r, g, b = int(rgb[0:2], 16), int(rgb[2:4], 16), int(rgb[4:6], 16)
+    return int(idx), (r, g, b)
 
 
 def save_pal(path: Path, pal: list[int]) -> None:
@@ -61,6 +75,7 @@ class App(tk.Tk):
 
         self.colors = tk.IntVar(value=256)
         self.sample_max = tk.IntVar(value=1024)
+        self.in_paths: list[str] = []
         self.index0_black = tk.BooleanVar(value=True)
 
         self.bg_choice = tk.StringVar(value="black")  # black / white
@@ -113,16 +128,18 @@ class App(tk.Tk):
         tk.Label(self, text=hint, fg="#444").pack(side="bottom", pady=6)
 
     def browse_input(self):
-        fn = filedialog.askopenfilename(
-            title="Select screenshot",
+        fns = filedialog.askopenfilenames(
+            title="Select screenshot(s)",
             filetypes=[("Images", "*.png *.jpg *.jpeg *.bmp *.gif *.tga *.webp"), ("All files", "*.*")]
         )
-        if not fn:
+        if not fns:
             return
-        self.in_path.set(fn)
+        # more screenshots -> one shared palette
+        self.in_paths = list(fns)
+        self.in_path.set("; ".join(fns))
 
-        # Default output next to input
-        p = Path(fn)
+        # Default output next to (first) input
+        p = Path(fns[0])
         self.out_path.set(str(p.with_suffix(".pal")))
 
     def browse_output(self):
@@ -156,11 +173,10 @@ class App(tk.Tk):
 
             bg = (0, 0, 0) if self.bg_choice.get() == "black" else (255, 255, 255)
 
-            img = Image.open(in_fn)
-            pal = build_palette_from_image(img, colors=colors, sample_max=sample_max, composite_bg=bg)
-
-            if self.index0_black.get():
-                pal[0:3] = [0, 0, 0]
+            paths = self.in_paths if "; ".join(self.in_paths) == in_fn else [in_fn]
+            locked = {0: (0, 0, 0)} if self.index0_black.get() else None
+            pal = build_palette_from_images((Image.open(p) for p in paths), colors=colors,
+                                            sample_max=sample_max, composite_bg=bg, locked=locked)
 
             save_pal(Path(out_fn), pal)
 
@@ -169,5 +185,38 @@ class App(tk.Tk):
             messagebox.showerror("Error", str(e))
 
 
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Screenshot(s) -> 256-color .PAL (768 bytes)")
+    ap.add_argument("images", nargs="+", type=Path)
+    ap.add_argument("-o", "--out", type=Path, required=True)
+    ap.add_argument("-c", "--colors", type=int, default=256)
+    ap.add_argument("--kmeans", type=int, default=8, help="k-means iterations, 0 = median cut only (default: %(default)s)")
+    ap.add_argument("--sample-max", type=int, default=0, help="downsample longer side to this (0 = full size)")
+    ap.add_argument("--bg", choices=["black", "white"], default="black", help="composite transparency over")
+    ap.add_argument("--lock", action="append", default=[], metavar="IDX=RRGGBB",
+                    help="keep this entry fixed (repeatable), e.g. 0=000000")
+    ap.add_argument("--lock-pal", type=Path, help="palette to take --lock-range entries from")
+    ap.add_argument("--lock-range", default="", help="indices to copy from --lock-pal, e.g. 0,240-255")
+    args = ap.parse_args(argv)
+
+    if not 2 <= args.colors <= 256:
+        ap.error("--colors must be 2..256")
+    locked = {}
+    if args.lock_pal:
+        pal = scale_vga6(list(args.lock_pal.read_bytes()[:768]))
+        locked.update(locked_from_palette(pal, parse_transparent(args.lock_range)))
+    locked.update(parse_lock(s) for s in args.lock)
+
+    bg = (0, 0, 0) if args.bg == "black" else (255, 255, 255)
+    pal = build_palette_from_images((Image.open(p) for p in args.images), colors=args.colors,
+                                    sample_max=args.sample_max, composite_bg=bg, locked=locked,
+                                    iterations=args.kmeans)
+    save_pal(args.out, pal)
+    print(f"{args.out}: {args.colors} colors from {len(args.images)} image(s), {len(locked)} locked")
+    return 0
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        raise SystemExit(main())
     App().mainloop()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import hashlib
+import logging
+
+import numpy as np
+
+import unlz
+import unsave
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger('save_diff')
+
+class SaveCache:
+    """ Decoded saves keyed by a hash of the file, so a save is decoded once
+        no matter how many comparisons it takes part in (or under how many
+        names the same autosave was copied).
+
+        With cache_dir, the decompressed data is also kept on disk as
+        <hash>.bin and reused by later runs.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.saves = {}
+        self.hits = 0
+
+    def load(self, path):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        key = hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+        save = self.saves.get(key)
+        if save is not None:
+            self.hits += 1
+            return save
+
+        data = None
+        cached = os.path.join(self.cache_dir, key + '.bin') if self.cache_dir else None
+        if cached is not None and os.path.exists(cached):
+            with open(cached, 'rb') as f:
+                data = f.read()
+
+        if data is None:
+            data = unlz.unpack_bytes(raw)
+            if cached is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(cached + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(cached + '.tmp', cached)
+
+        save = unsave.SaveGame.from_bytes(data)
+        self.saves[key] = save
+        return save
+
+def diff(a, b):
+    """ Field-level differences between two SaveGames, as a dict of:
+
+        header  -- [(word index, old, new)]
+        renamed -- [(record index, old name, new name)]
+        changed -- [(record index, name, [(byte offset, old, new)])]
+        added / removed -- [(record index, name)] past the end of the shorter save
+        appeared / vanished -- names present in only one of the saves
+    """
+    result = {}
+
+    words = np.flatnonzero(a.header != b.header)
+    result['header'] = list(zip(words.tolist(), a.header[words].tolist(), b.header[words].tolist()))
+
+    # records are compared slot by slot over the common length
+    n = min(len(a.records), len(b.records))
+    ra = a.records[:n]
+    rb = b.records[:n]
+    names_a = a.names()
+    names_b = b.names()
+
+    renamed = np.flatnonzero(ra['name'] != rb['name'])
+    result['renamed'] = [(i, names_a[i], names_b[i]) for i in renamed.tolist()]
+
+    data_diff = ra['data'] != rb['data']
+    rows, offsets = np.nonzero(data_diff)
+    old = ra['data'][rows, offsets].tolist()
+    new = rb['data'][rows, offsets].tolist()
+
+    changed = []
+    # rows come sorted, so each record's offsets are one contiguous run
+    starts = np.flatnonzero(np.diff(rows, prepend=-1)).tolist() + [len(rows)]
+    rows = rows.tolist()
+    offsets = offsets.tolist()
+    for start, end in zip(starts, starts[1:]):
+        i = rows[start]
+        changed.append((i, names_b[i], list(zip(offsets[start:end], old[start:end], new[start:end]))))
+    result['changed'] = changed
+
+    result['removed'] = [(i, names_a[i]) for i in range(n, len(a.records))]
+    result['added'] = [(i, names_b[i]) for i in range(n, len(b.records))]
+
+    gone = np.flatnonzero(~np.isin(a.records['name'], b.records['name']))
+    fresh = np.flatnonzero(~np.isin(b.records['name'], a.records['name']))
+    result['vanished'] = [names_a[i] for i in gone.tolist()]
+    result['appeared'] = [names_b[i] for i in fresh.tolist()]
+
+    return result
+
+def format_diff(result):
+    lines = []
+    for word, old, new in result['header']:
+        lines.append('header[%d]: %d -> %d' % (word, old, new))
+    for i, old, new in result['renamed']:
+        lines.append('record %d: renamed %r -> %r' % (i, old, new))
+    for i, name, fields in result['changed']:
+        lines.append('record %d (%s): %s' % (i, name,
+            ', '.join('data[%d] %d -> %d' % field for field in fields)))
+    for i, name in result['removed']:
+        lines.append('record %d (%s): removed' % (i, name))
+    for i, name in result['added']:
+        lines.append('record %d (%s): added' % (i, name))
+    for name in result['vanished']:
+        lines.append('vanished: %s' % name)
+    for name in result['appeared']:
+        lines.append('appeared: %s' % name)
+    return lines
+
+def main():
+    """ save_diff.py SAVE1 SAVE2 [SAVE3 ...] -- diff every save against the previous one """
+    if len(sys.argv) < 3:
+        print('usage: %s SAVE1 SAVE2 [SAVE3 ...]' % sys.argv[0])
+        sys.exit(1)
+
+    cache = SaveCache(os.environ.get('SAVE_DIFF_CACHE'))
+    paths = sys.argv[1:]
+    for old, new in zip(paths, paths[1:]):
+        lines = format_diff(diff(cache.load(old), cache.load(new)))
+        print('--- %s\n+++ %s' % (old, new))
+        for line in lines or ['(no differences)']:
+            print(line)
+
+    log.debug('%d cache hits' % cache.hits)
+
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,11 @@ try:
 except ImportError:
     raise SystemExit("Missing dependency: Pillow. Install with: pip install pillow")
 
+try:
+    import spellimg
+except ImportError as e:
+    raise SystemExit("Missing dependency: NumPy (for spellimg). Install with: pip install numpy") from e
+
 
 # ---------- core helpers (same logic as CLI tool) ----------
 
@@ -71,66 +76,14 @@ def infer_dims(n: int) -> Optional[Tuple[int, int]]:
     return candidates[0][1], candidates[0][2]
 
 def parse_palette(pal_bytes: bytes, img_bytes: bytes, offset_override: Optional[int] = None) -> List[int]:
-    full = []
-    for i in range(256):
-        full += [i, i, i]
-
-    if len(pal_bytes) == 768:
-        p = list(pal_bytes[:768])
-        return [max(0, min(255, x)) for x in p]
+    """
+    Return a 256*3 list suitable for PIL putpalette(), see spellimg.parse_palette.
+    Values are taken as 8-bit, no VGA 6-bit scaling.
+    """
+    return spellimg.parse_palette(pal_bytes, img_bytes, offset_override, vga6=False)
 
-    if len(pal_bytes) != 192:
-        raise ValueError(f"Unsupported palette size: {len(pal_bytes)} bytes (expected 192 or 768)")
 
-    chunk = [max(0, min(255, x)) for x in list(pal_bytes)]
-
-    if offset_override is not None:
-        base = offset_override
-    else:
-        used = set(img_bytes)
-        used.discard(0)
-        if not used:
-            base = 0
-        else:
-            mn = min(used)
-            if 120 <= mn <= 135:
-                base = 128
-            elif 185 <= mn <= 205:
-                base = 192
-            else:
-                base = int(round(mn / 64)) * 64
-                base = max(0, min(192, base))
-
-    if base % 64 != 0:
-        base = (base // 64) * 64
-
-    start = base * 3
-    full[start:start + 192] = chunk
-    return full
-
-def parse_transparent_indices(s: str) -> List[int]:
-    s = (s or "").strip()
-    if not s:
-        return []
-    out: List[int] = []
-    for part in s.replace(";", ",").split(","):
-        part = part.strip()
-        if not part:
-            continue
-        if "-" in part:
-            a, b = part.split("-", 1)
-            a_i = int(a.strip()); b_i = int(b.strip())
-            step = 1 if b_i >= a_i else -1
-            out.extend(list(range(a_i, b_i + step, step)))
-        else:
-            out.append(int(part))
-    out = [max(0, min(255, i)) for i in out]
-    seen = set()
-    uniq = []
-    for i in out:
-        if i not in seen:
-            uniq.append(i); seen.add(i)
-    return uniq
+parse_transparent_indices = spellimg.parse_transparent
 
 def convert_to_png(
     bin_path: Path,
@@ -161,16 +114,7 @@ def convert_to_png(
         im.putpalette(palette)
 
     if transparent:
-        rgba = im.convert("RGBA")
-        pix = rgba.load()
-        for y in range(h):
-            row_off = y * w
-            for x in range(w):
-                idx = img_bytes[row_off + x]
-                if idx in transparent:
-                    r, g, b, _a = pix[x, y]
-                    pix[x, y] = (r, g, b, 0)
-        out_im = rgba
+        out_im = spellimg.apply_transparency(im, transparent)
     else:
         out_im = im
 
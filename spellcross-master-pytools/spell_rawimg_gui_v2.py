@@ -25,6 +25,11 @@ try:
 except ImportError:
     raise SystemExit("Missing dependency: Pillow. Install with: pip install pillow")
 
+try:
+    import spellimg
+except ImportError as e:
+    raise SystemExit("Missing dependency: NumPy (for spellimg). Install with: pip install numpy") from e
+
 
 def read_bytes(path: Path) -> bytes:
     return path.read_bytes()
@@ -190,35 +195,8 @@ def parse_palette(pal_bytes: bytes, img8: bytes, offset_override: Optional[int]
     full[start:end] = rgb[: n_colors * 3]
     return full
 
-def parse_transparent_indices(s: str) -> List[int]:
-    s=(s or "").strip()
-    if not s: return []
-    out: List[int] = []
-    for part in s.replace(";",",").split(","):
-        part=part.strip()
-        if not part: continue
-        if "-" in part:
-            a,b=part.split("-",1)
-            a_i=int(a.strip()); b_i=int(b.strip())
-            step=1 if b_i>=a_i else -1
-            out.extend(list(range(a_i,b_i+step,step)))
-        else:
-            out.append(int(part))
-    out=[max(0,min(255,i)) for i in out]
-    seen=set(); uniq=[]
-    for i in out:
-        if i not in seen:
-            uniq.append(i); seen.add(i)
-    return uniq
-
-def unpack_4bpp_to_8bpp(packed: bytes) -> bytes:
-    out=bytearray(len(packed)*2)
-    j=0
-    for b in packed:
-        out[j]=(b>>4)&0x0F
-        out[j+1]=b&0x0F
-        j+=2
-    return bytes(out)
+parse_transparent_indices = spellimg.parse_transparent
+unpack_4bpp_to_8bpp = spellimg.unpack_packed4
 
 def convert_to_png(bin_path:Path,pal_path:Optional[Path],w:int,h:int,bpp:int,auto_bpp:bool,
                    pal_offset:Optional[int],transparent:List[int],scale:int,out_path:Path)->Tuple[int,int,int]:
@@ -252,15 +230,7 @@ def convert_to_png(bin_path:Path,pal_path:Optional[Path],w:int,h:int,bpp:int,aut
         im.putpalette(palette)
 
     if transparent:
-        rgba=im.convert("RGBA")
-        pix=rgba.load()
-        for y in range(h):
-            row=y*w
-            for x in range(w):
-                if img8[row+x] in transparent:
-                    r,g,b,_a=pix[x,y]
-                    pix[x,y]=(r,g,b,0)
-        out_im=rgba
+        out_im=spellimg.apply_transparency(im,transparent)
     else:
         out_im=im
 
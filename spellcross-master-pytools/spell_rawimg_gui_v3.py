@@ -3,147 +3,30 @@
 spell_rawimg_gui_v3.py
 
 Mini GUI for Spellcross RAW -> PNG converter (v3).
-Adds planar4 support (VGA 4-bitplanes).
+Adds planar support (EGA/VGA 2/4/8 bitplanes).
 
-Requires: Pillow (pip install pillow)
+Requires: Pillow, NumPy (pip install pillow numpy)
 """
 
 from __future__ import annotations
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
-from typing import List, Optional
 
 from PIL import Image
 
-# --- import core logic from v3 tool (copy small subset) ---
+# --- core logic lives in the shared spellimg package ---
+from spellimg import (
+    apply_transparency,
+    parse_palette,
+    parse_transparent as parse_transparent_indices,
+    unpack_packed4 as unpack_4bpp_packed,
+    unpack_planar,
+)
 
 def read_bytes(path: Path) -> bytes:
     return path.read_bytes()
 
-def _maybe_scale_vga6(values: List[int]) -> List[int]:
-    if values and max(values) <= 63:
-        return [min(255, v * 4) for v in values]
-    return values
-
-def parse_palette(pal_bytes: bytes, img8: bytes, offset_override: Optional[int] = None) -> List[int]:
-    full: List[int] = []
-    for i in range(256):
-        full += [i, i, i]
-
-    if len(pal_bytes) == 768:
-        p = [max(0, min(255, x)) for x in list(pal_bytes[:768])]
-        return _maybe_scale_vga6(p)
-
-    if len(pal_bytes) == 96:
-        chunk = [max(0, min(255, x)) for x in list(pal_bytes)]
-        chunk = _maybe_scale_vga6(chunk)
-        full[0:96] = chunk
-        return full
-
-    if len(pal_bytes) != 192:
-        raise ValueError(f"Unsupported palette size: {len(pal_bytes)} bytes (expected 96/192/768).")
-
-    chunk = [max(0, min(255, x)) for x in list(pal_bytes)]
-    chunk = _maybe_scale_vga6(chunk)
-
-    if offset_override is not None:
-        base = offset_override
-    else:
-        used = set(img8); used.discard(0)
-        if not used:
-            base = 0
-        else:
-            mn = min(used)
-            if 120 <= mn <= 135:
-                base = 128
-            elif 185 <= mn <= 205:
-                base = 192
-            else:
-                base = int(round(mn / 64)) * 64
-                base = max(0, min(192, base))
-    if base % 64 != 0:
-        base = (base // 64) * 64
-    full[base * 3: base * 3 + 192] = chunk
-    return full
-
-def parse_transparent_indices(s: str) -> List[int]:
-    s = (s or "").strip()
-    if not s:
-        return []
-    out: List[int] = []
-    for part in s.replace(";", ",").split(","):
-        part = part.strip()
-        if not part:
-            continue
-        if "-" in part:
-            a, b = part.split("-", 1)
-            a_i = int(a.strip()); b_i = int(b.strip())
-            step = 1 if b_i >= a_i else -1
-            out.extend(list(range(a_i, b_i + step, step)))
-        else:
-            out.append(int(part))
-    out = [max(0, min(255, i)) for i in out]
-    uniq = []
-    seen = set()
-    for i in out:
-        if i not in seen:
-            uniq.append(i); seen.add(i)
-    return uniq
-
-def unpack_4bpp_packed(packed: bytes) -> bytes:
-    out = bytearray(len(packed) * 2)
-    j = 0
-    for b in packed:
-        out[j] = (b >> 4) & 0x0F
-        out[j + 1] = b & 0x0F
-        j += 2
-    return bytes(out)
-
-def unpack_planar4(raw: bytes, width: int, height: int, layout: str = "rows") -> bytes:
-    if width % 8 != 0:
-        raise ValueError("planar4 requires width multiple of 8")
-    bpr = width // 8
-    expected = 4 * bpr * height
-    if len(raw) != expected:
-        raise ValueError(f"planar4 size mismatch: {len(raw)} != {expected}")
-    out = bytearray(width * height)
-
-    if layout == "planes":
-        plane_size = bpr * height
-        planes = [raw[i * plane_size:(i + 1) * plane_size] for i in range(4)]
-        for y in range(height):
-            row_off = y * width
-            for xb in range(bpr):
-                bp = [planes[p][y * bpr + xb] for p in range(4)]
-                for bit in range(8):
-                    mask = 1 << (7 - bit)
-                    v = 0
-                    if bp[0] & mask: v |= 1
-                    if bp[1] & mask: v |= 2
-                    if bp[2] & mask: v |= 4
-                    if bp[3] & mask: v |= 8
-                    out[row_off + xb * 8 + bit] = v
-        return bytes(out)
-
-    pos = 0
-    for y in range(height):
-        row_planes = [raw[pos + p * bpr: pos + (p + 1) * bpr] for p in range(4)]
-        pos += 4 * bpr
-        row_off = y * width
-        for xb in range(bpr):
-            bp = [row_planes[p][xb] for p in range(4)]
-            for bit in range(8):
-                mask = 1 << (7 - bit)
-                v = 0
-                if bp[0] & mask: v |= 1
-                if bp[1] & mask: v |= 2
-                if bp[2] & mask: v |= 4
-                if bp[3] & mask: v |= 8
-                out[row_off + xb * 8 + bit] = v
-    return bytes(out)
-
-
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -192,14 +75,14 @@ class App(tk.Tk):
 
         ttk.Label(params, text="Format:").grid(row=1, column=0, sticky="w", pady=(8,0))
         ttk.Combobox(params, textvariable=self.format_var, width=10,
-                     values=["auto","8bpp","packed4","planar4"], state="readonly")\
+                     values=["auto","8bpp","packed4","planar2","planar4","planar8"], state="readonly")\
             .grid(row=1, column=1, sticky="w", padx=(6,18), pady=(8,0))
 
         ttk.Label(params, text="Planar layout:").grid(row=1, column=2, sticky="w", pady=(8,0))
         ttk.Combobox(params, textvariable=self.planar_layout_var, width=10,
                      values=["rows","planes"], state="readonly")\
             .grid(row=1, column=3, sticky="w", padx=(6,18), pady=(8,0))
-        ttk.Label(params, text="(jen pro planar4)").grid(row=1, column=4, sticky="w", pady=(8,0))
+        ttk.Label(params, text="(jen pro planar)").grid(row=1, column=4, sticky="w", pady=(8,0))
 
         ttk.Label(params, text="Scale:").grid(row=2, column=0, sticky="w", pady=(8,0))
         ttk.Combobox(params, textvariable=self.scale_var, width=6,
@@ -297,8 +180,8 @@ class App(tk.Tk):
                 if len(raw) != (w*h)//2:
                     raise ValueError("packed4: size != w*h/2")
                 img8 = unpack_4bpp_packed(raw)
-            elif fmt == "planar4":
-                img8 = unpack_planar4(raw, w, h, layout=layout)
+            elif fmt in ("planar2", "planar4", "planar8"):
+                img8 = unpack_planar(raw, w, h, int(fmt[len("planar"):]), layout=layout)
             else:
                 raise ValueError("Neznámý format")
 
@@ -315,15 +198,7 @@ class App(tk.Tk):
                 im.putpalette(palette)
 
             if trans:
-                rgba = im.convert("RGBA")
-                pix = rgba.load()
-                for y in range(h):
-                    row = y * w
-                    for x in range(w):
-                        if img8[row + x] in trans:
-                            r, g, b, _a = pix[x, y]
-                            pix[x, y] = (r, g, b, 0)
-                out_im = rgba
+                out_im = apply_transparency(im, trans)
             else:
                 out_im = im
 
@@ -31,6 +31,11 @@ try:
 except ImportError as e:
     raise SystemExit("Missing dependency: Pillow. Install with: pip install pillow") from e
 
+try:
+    import spellimg
+except ImportError as e:
+    raise SystemExit("Missing dependency: NumPy (for spellimg). Install with: pip install numpy") from e
+
 
 def read_bytes(path: Path) -> bytes:
     return path.read_bytes()
@@ -93,86 +98,13 @@ def infer_dims(n: int) -> Optional[Tuple[int, int]]:
 
 def parse_palette(pal_bytes: bytes, img_bytes: bytes, offset_override: Optional[int] = None) -> List[int]:
     """
-    Return a 256*3 list suitable for PIL putpalette().
-
-    For 64-color palettes (192 bytes), map into 256 palette at inferred offset:
-      - infer from image indices: min non-zero index tends to be 128 or 192
+    Return a 256*3 list suitable for PIL putpalette(), see spellimg.parse_palette.
+    Values are taken as 8-bit, no VGA 6-bit scaling.
     """
-    # default filler palette: grayscale ramp (so unknown indices are still visible)
-    full = []
-    for i in range(256):
-        full += [i, i, i]
-
-    if len(pal_bytes) == 768:
-        # full palette
-        # clamp to 0..255 just in case
-        p = list(pal_bytes[:768])
-        p = [max(0, min(255, x)) for x in p]
-        return p
-
-    if len(pal_bytes) != 192:
-        raise ValueError(f"Unsupported palette size: {len(pal_bytes)} bytes (expected 192 or 768)")
-
-    # 64-color chunk
-    chunk = list(pal_bytes)
-    chunk = [max(0, min(255, x)) for x in chunk]
-
-    if offset_override is not None:
-        base = offset_override
-    else:
-        # infer base from used indices
-        used = set(img_bytes)
-        used.discard(0)
-        if not used:
-            base = 0
-        else:
-            mn = min(used)
-            # snap to typical ranges
-            if 120 <= mn <= 135:
-                base = 128
-            elif 185 <= mn <= 205:
-                base = 192
-            else:
-                # fallback: choose nearest multiple of 64
-                base = int(round(mn / 64)) * 64
-                base = max(0, min(192, base))
-
-    if base % 64 != 0:
-        base = (base // 64) * 64
-
-    # map chunk colors into full palette
-    start = base * 3
-    full[start:start + 192] = chunk
-    return full
-
-
-def parse_transparent_indices(s: Optional[str]) -> List[int]:
-    if not s:
-        return []
-    out: List[int] = []
-    for part in s.replace(";", ",").split(","):
-        part = part.strip()
-        if not part:
-            continue
-        if "-" in part:
-            a, b = part.split("-", 1)
-            a_i = int(a.strip())
-            b_i = int(b.strip())
-            step = 1 if b_i >= a_i else -1
-            out.extend(list(range(a_i, b_i + step, step)))
-        else:
-            out.append(int(part))
-    # clamp
-    out = [max(0, min(255, i)) for i in out]
-    # unique preserving order
-    seen = set()
-    uniq = []
-    for i in out:
-        if i not in seen:
-            uniq.append(i)
-            seen.add(i)
-    return uniq
+    return spellimg.parse_palette(pal_bytes, img_bytes, offset_override, vga6=False)
+
 
+parse_transparent_indices = spellimg.parse_transparent
 
 def to_png(
     img_bytes: bytes,
@@ -193,15 +125,7 @@ def to_png(
 
     if transparent:
         # Convert to RGBA and apply alpha mask
-        rgba = im.convert("RGBA")
-        pix = rgba.load()
-        for y in range(h):
-            for x in range(w):
-                idx = img_bytes[y * w + x]
-                if idx in transparent:
-                    r, g, b, _a = pix[x, y]
-                    pix[x, y] = (r, g, b, 0)
-        out_im = rgba
+        out_im = spellimg.apply_transparency(im, transparent)
     else:
         out_im = im
 
@@ -0,0 +1,74 @@
+"""
+spellimg -- shared core of the Spellcross indexed-image tools.
+
+One NumPy implementation of the RAW pixel decoders (registry in
+spellimg.formats), the geometric transforms as strided views
+(spellimg.transform), palette/transparency handling
+(spellimg.palette), size inference (spellimg.dims), a palette
+quantizer for screenshots (spellimg.quantize) and palette matching
+(spellimg.palmatch). The rawimg CLIs and GUIs all call into it.
+"""
+
+from .dims import (
+    divisors,
+    infer_dims,
+    known_sizes,
+    learn_size,
+)
+from .formats import (
+    FORMATS,
+    PixelFormat,
+    decode,
+    decode_8bpp,
+    decode_packed4,
+    decode_planar,
+    decode_planar2,
+    decode_planar4,
+    decode_planar8,
+    detect_format,
+    get_format,
+    register_format,
+)
+from .palette import (
+    apply_transparency,
+    guess_palette_base,
+    parse_palette,
+    parse_transparent,
+    scale_vga6,
+)
+from .palmatch import (
+    PaletteIndex,
+    PaletteMatch,
+    best_palettes,
+)
+from .quantize import (
+    ColorHistogram,
+    locked_from_palette,
+    palette_from_images,
+    quantize_histogram,
+)
+from .transform import (
+    TRANSFORMS,
+    apply_transform,
+    colmajor,
+    colmajor_view,
+    compose,
+    register_transform,
+    reorder_colmajor_to_rowmajor,
+    to_image,
+    transform_view,
+)
+
+
+def unpack_packed4(buf: bytes, swap_nibbles: bool = False) -> bytes:
+    """Two 4-bit pixels per byte -> one byte per pixel."""
+    return decode_packed4(buf, len(buf) * 2, 1, swap_nibbles=swap_nibbles).tobytes()
+
+
+def unpack_planar4(raw: bytes, width: int, height: int, layout: str = "rows") -> bytes:
+    return decode("planar4", raw, width, height, layout=layout).tobytes()
+
+
+def unpack_planar(raw: bytes, width: int, height: int, planes: int = 4, layout: str = "rows") -> bytes:
+    """Any number of bitplanes (2/4/8 are registered as formats) -> one byte per pixel."""
+    return decode(f"planar{planes}", raw, width, height, layout=layout).tobytes()
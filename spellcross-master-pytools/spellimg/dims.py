@@ -0,0 +1,189 @@
+"""
+Width x height of a headerless image from its pixel count (and pixels).
+
+Known Spellcross sizes (known_sizes.json, plus the ones learned into the
+user's config directory) are tried first. Otherwise every factor pair is
+enumerated from the divisors of the pixel count, and when the pixels are
+available the pairs are ranked by how similar each row is to the next
+one, which is lowest at the true width. Without pixels, or on a tie, a
+shape prior (landscape, close to 4:3/3:2/16:9) decides.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# shipped with the package, read only
+KNOWN_SIZES_FILE = Path(__file__).with_name("known_sizes.json")
+
+
+def user_sizes_file() -> Path:
+    """Where learn_size() keeps confirmed sizes: $SPELLIMG_SIZES, or
+    known_sizes.json in the user's config directory."""
+    env = os.environ.get("SPELLIMG_SIZES")
+    if env:
+        return Path(env)
+    base = os.environ.get("APPDATA") if os.name == "nt" else os.environ.get("XDG_CONFIG_HOME")
+    return Path(base or Path.home() / ".config") / "spellimg" / "known_sizes.json"
+
+# pixel pairs compared per candidate width, at fixed relative positions
+ROW_SAMPLES = 2048
+_SAMPLE_AT = np.random.default_rng(0).random(ROW_SAMPLES)
+
+_known_sizes: Optional[List[Tuple[int, int]]] = None
+# memoized results of infer_dims, least recently used dropped past CACHE_MAX
+CACHE_MAX = 1024
+_cache: OrderedDict[tuple, Optional[Tuple[int, int]]] = OrderedDict()
+
+
+def _read_sizes(path: Path) -> List[Tuple[int, int]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [(int(w), int(h)) for w, h in json.load(f)]
+    except (OSError, ValueError):
+        return []
+
+
+def known_sizes() -> List[Tuple[int, int]]:
+    """The shipped sizes, then the ones learned by this user."""
+    global _known_sizes
+    if _known_sizes is None:
+        _known_sizes = _read_sizes(KNOWN_SIZES_FILE)
+        _known_sizes += [size for size in _read_sizes(user_sizes_file()) if size not in _known_sizes]
+    return _known_sizes
+
+
+def learn_size(width: int, height: int, path: Optional[Path] = None) -> None:
+    """Add a confirmed size to the table, saved right away to path
+    (default user_sizes_file(); the package directory is never written)."""
+    sizes = known_sizes()
+    if (width, height) in sizes:
+        return
+    sizes.append((width, height))
+
+    path = Path(path) if path is not None else user_sizes_file()
+    learned = _read_sizes(path)
+    learned.append((width, height))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump([list(size) for size in learned], f)
+    os.replace(tmp, path)
+    _cache.clear()
+
+
+def divisors(n: int) -> List[int]:
+    """All divisors of n, ascending, in O(sqrt n)."""
+    small, large = [], []
+    i = 1
+    while i * i <= n:
+        if n % i == 0:
+            small.append(i)
+            if i * i != n:
+                large.append(n // i)
+        i += 1
+    return small + large[::-1]
+
+
+def shape_prior(w: int, h: int) -> float:
+    """Lower is more plausible: landscape near a common aspect, not tiny or huge."""
+    if w < h:
+        return 1e8 + (h - w)
+    ar = w / h
+    d = min(abs(ar - 4 / 3), abs(ar - 3 / 2), abs(ar - 16 / 9))
+    if w * h < 1500:
+        d += 0.5
+    if w * h > 2_000_000:
+        d += 0.5
+    return d
+
+
+def row_scores(pixels: np.ndarray, strides: np.ndarray) -> np.ndarray:
+    """
+    Mean |pixel - pixel one row below| for every candidate row stride (the
+    width, or the height for column-major data), on the same ROW_SAMPLES
+    relative positions for each, all in one vectorized pass.
+    """
+    n = len(pixels)
+    pos = (_SAMPLE_AT[None, :] * (n - strides)[:, None]).astype(np.int64)
+    a = pixels[pos].astype(np.int16)
+    b = pixels[pos + strides[:, None]].astype(np.int16)
+    return np.abs(a - b).mean(axis=1)
+
+
+def infer_dims(
+    n: int,
+    pixels=None,
+    min_w: int = 1,
+    max_w: int = 4096,
+    min_h: int = 1,
+    max_h: int = 4096,
+    transposed: bool = False,
+) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) with width*height == n within the bounds, or None.
+
+    pixels: the n pixel indices (bytes or uint8 array) to rank candidates by
+    content. transposed: the data is stored column by column (w columns of
+    h pixels), so known sizes are tried as height x width and the pixels
+    repeat every h, not every w.
+    The last CACHE_MAX results are memoized by (n, hash of the pixels, bounds).
+    """
+    digest = None
+    if pixels is not None:
+        if isinstance(pixels, np.ndarray):
+            pixels = pixels.ravel()
+        else:
+            pixels = np.frombuffer(pixels, dtype=np.uint8)
+        if len(pixels) != n:
+            raise ValueError(f"{len(pixels)} pixels given for n={n}")
+        digest = hashlib.blake2b(pixels.tobytes(), digest_size=16).digest()
+
+    key = (n, digest, min_w, max_w, min_h, max_h, transposed)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    def fits(w: int, h: int) -> bool:
+        return min_w <= w <= max_w and min_h <= h <= max_h
+
+    result = None
+    for w, h in known_sizes():
+        if transposed:
+            w, h = h, w
+        if w * h == n and fits(w, h):
+            result = (w, h)
+            break
+
+    if result is None and n > 0:
+        cands = [(w, n // w) for w in divisors(n) if fits(w, n // w)]
+        if len(cands) == 1:
+            result = cands[0]
+        elif cands:
+            if transposed:
+                prior = np.array([shape_prior(h, w) for w, h in cands])
+            else:
+                prior = np.array([shape_prior(w, h) for w, h in cands])
+            if pixels is not None:
+                # distance between neighbors across the stored lines
+                strides = np.array([h if transposed else w for w, h in cands], dtype=np.int64)
+                # only strides that leave at least two lines can be scored
+                ok = strides < n
+                scores = np.where(ok, 0.0, np.inf)
+                scores[ok] = row_scores(pixels, strides[ok])
+                order = np.lexsort((prior, scores))
+            else:
+                order = np.argsort(prior, kind="stable")
+            result = cands[int(order[0])]
+
+    _cache[key] = result
+    if len(_cache) > CACHE_MAX:
+        _cache.popitem(last=False)
+    return result
@@ -0,0 +1,141 @@
+"""
+Pixel format registry.
+
+Every format decodes a headerless RAW buffer into a (height, width) uint8
+array of palette indices. New formats register themselves with
+@register_format and are then available to every tool by name.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class PixelFormat:
+    name: str
+    decode: Callable[..., np.ndarray]
+    # numerator/denominator of bytes per pixel, so 4bpp is 1/2
+    bytes_num: int = 1
+    bytes_den: int = 1
+    # width must be a multiple of this (planar formats store 8 pixels per byte)
+    width_align: int = 1
+    aliases: List[str] = field(default_factory=list)
+
+    def expected_size(self, width: int, height: int) -> int:
+        return width * height * self.bytes_num // self.bytes_den
+
+    def fits(self, size: int, width: int, height: int) -> bool:
+        if width % self.width_align != 0 or (width * height * self.bytes_num) % self.bytes_den != 0:
+            return False
+        return self.expected_size(width, height) == size
+
+
+FORMATS: Dict[str, PixelFormat] = {}
+
+
+def register_format(
+    name: str,
+    bytes_num: int = 1,
+    bytes_den: int = 1,
+    width_align: int = 1,
+    aliases: Optional[List[str]] = None,
+) -> Callable:
+    """Decorator: register decode(raw, width, height, **options) as pixel format name."""
+    def wrap(decode: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        fmt = PixelFormat(name, decode, bytes_num, bytes_den, width_align, list(aliases or []))
+        for key in [name, *fmt.aliases]:
+            FORMATS[key] = fmt
+        return decode
+    return wrap
+
+
+def get_format(name: str) -> PixelFormat:
+    try:
+        return FORMATS[name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Unknown pixel format: {name}") from None
+
+
+def decode(name: str, raw: bytes, width: int, height: int, **options) -> np.ndarray:
+    """RAW -> (height, width) uint8 indices; raises ValueError if the size doesn't match."""
+    fmt = get_format(name)
+    if width % fmt.width_align != 0:
+        raise ValueError(f"{fmt.name} requires width multiple of {fmt.width_align}")
+    expected = fmt.expected_size(width, height)
+    if len(raw) != expected:
+        raise ValueError(f"{fmt.name} size mismatch: {len(raw)} != {expected}")
+    return fmt.decode(raw, width, height, **options)
+
+
+def detect_format(size: int, width: int, height: int, candidates=("8bpp", "packed4")) -> Optional[str]:
+    """First of candidates whose size for width x height is exactly size."""
+    for name in candidates:
+        if get_format(name).fits(size, width, height):
+            return get_format(name).name
+    return None
+
+
+@register_format("8bpp", aliases=["8", "linear"])
+def decode_8bpp(raw: bytes, width: int, height: int) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.uint8).reshape(height, width)
+
+
+@register_format("packed4", bytes_den=2, aliases=["4bpp", "4"])
+def decode_packed4(raw: bytes, width: int, height: int, swap_nibbles: bool = False) -> np.ndarray:
+    """Two pixels per byte, high nibble first (low first with swap_nibbles)."""
+    packed = np.frombuffer(raw, dtype=np.uint8)
+    out = np.empty(len(packed) * 2, dtype=np.uint8)
+    hi, lo = (1, 0) if swap_nibbles else (0, 1)
+    out[hi::2] = packed >> 4
+    out[lo::2] = packed & 0x0F
+    return out.reshape(height, width)
+
+
+# byte -> its 8 bits as 8 bytes (MSB first), one uint64 per byte value
+PLANE_SPREAD = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).view(np.uint64).ravel()
+
+
+def decode_planar(raw: bytes, width: int, height: int, planes: int = 4, layout: str = "rows") -> np.ndarray:
+    """
+    EGA/VGA bitplanes, plane p holds bit p of each pixel, MSB = leftmost pixel.
+    layout "rows": each row stores its planes one after another;
+    layout "planes": each plane stores the whole image.
+
+    Every plane byte becomes 8 pixels through one lookup in PLANE_SPREAD,
+    and the planes are shifted into place on whole uint64 words.
+    """
+    bpr = width // 8
+    data = np.frombuffer(raw, dtype=np.uint8, count=planes * bpr * height)
+    if layout == "planes":
+        data = data.reshape(planes, height, bpr)
+    elif layout == "rows":
+        data = data.reshape(height, planes, bpr).transpose(1, 0, 2)
+    else:
+        raise ValueError(f"Unknown planar layout: {layout}")
+
+    out = np.take(PLANE_SPREAD, data[0])
+    tmp = np.empty_like(out)
+    for p in range(1, planes):
+        np.take(PLANE_SPREAD, data[p], out=tmp)
+        tmp <<= np.uint64(p)
+        out |= tmp
+    return out.view(np.uint8).reshape(height, width)
+
+
+@register_format("planar2", bytes_den=4, width_align=8)
+def decode_planar2(raw: bytes, width: int, height: int, layout: str = "rows") -> np.ndarray:
+    return decode_planar(raw, width, height, 2, layout)
+
+
+@register_format("planar4", bytes_den=2, width_align=8)
+def decode_planar4(raw: bytes, width: int, height: int, layout: str = "rows") -> np.ndarray:
+    return decode_planar(raw, width, height, 4, layout)
+
+
+@register_format("planar8", width_align=8)
+def decode_planar8(raw: bytes, width: int, height: int, layout: str = "rows") -> np.ndarray:
+    return decode_planar(raw, width, height, 8, layout)
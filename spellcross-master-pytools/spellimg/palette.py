@@ -0,0 +1,96 @@
+"""Palettes (.PAL) and transparency for indexed Spellcross images."""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+
+def scale_vga6(pal: List[int]) -> List[int]:
+    """VGA DAC values (0..63) -> 0..255; anything brighter is returned as is."""
+    return [min(255, v * 4) for v in pal] if pal and max(pal) <= 63 else pal
+
+
+def guess_palette_base(img8: bytes) -> int:
+    """Where a 64-color chunk goes in the 256 palette, from the smallest non-zero index used."""
+    counts = np.bincount(np.frombuffer(img8, dtype=np.uint8), minlength=256)
+    used = np.flatnonzero(counts[1:])
+    if not len(used):
+        return 0
+
+    mn = int(used[0]) + 1
+    if 120 <= mn <= 135:
+        return 128
+    if 185 <= mn <= 205:
+        return 192
+    return max(0, min(192, int(round(mn / 64)) * 64))
+
+
+def parse_palette(
+    pal_bytes: bytes,
+    img8: bytes,
+    offset_override: Optional[int] = None,
+    vga6: bool = True,
+) -> List[int]:
+    """
+    Return a 256*3 list suitable for PIL putpalette().
+
+    768 bytes is a full palette, 96 bytes fills indices 0..31 and a 192-byte
+    (64-color) chunk is placed at offset_override or an offset inferred from
+    the image. Unused entries stay a grayscale ramp. With vga6, 6-bit VGA
+    values are scaled up to 8 bits.
+    """
+    full: List[int] = []
+    for i in range(256):
+        full += [i, i, i]
+
+    chunk = list(pal_bytes)
+    if vga6:
+        chunk = scale_vga6(chunk)
+
+    if len(pal_bytes) == 768:
+        return chunk
+
+    if len(pal_bytes) == 96:
+        full[0:96] = chunk
+        return full
+
+    if len(pal_bytes) != 192:
+        raise ValueError(f"Unsupported palette size: {len(pal_bytes)} bytes (expected 96/192/768)")
+
+    base = offset_override if offset_override is not None else guess_palette_base(img8)
+    base = (base // 64) * 64
+    full[base * 3: base * 3 + 192] = chunk
+    return full
+
+
+def parse_transparent(s: Optional[str]) -> List[int]:
+    """'0,5-9;200' -> [0, 5, 6, 7, 8, 9, 200], clamped to 0..255, unique, in order."""
+    s = (s or "").strip()
+    if not s:
+        return []
+    out: List[int] = []
+    for part in s.replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            a, b = part.split("-", 1)
+            a_i = int(a.strip()); b_i = int(b.strip())
+            step = 1 if b_i >= a_i else -1
+            out.extend(range(a_i, b_i + step, step))
+        else:
+            out.append(int(part))
+    return list(dict.fromkeys(max(0, min(255, i)) for i in out))
+
+
+def apply_transparency(im: Image.Image, trans: List[int]) -> Image.Image:
+    """P image -> RGBA, palette indices in trans get alpha 0."""
+    alpha_lut = np.full(256, 255, dtype=np.uint8)
+    alpha_lut[trans] = 0
+    idx = np.frombuffer(im.tobytes(), dtype=np.uint8)
+    rgba = im.convert("RGBA")
+    rgba.putalpha(Image.frombytes("L", im.size, alpha_lut[idx].tobytes()))
+    return rgba
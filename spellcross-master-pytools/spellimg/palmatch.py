@@ -0,0 +1,168 @@
+"""
+Which .PAL does an asset belong to.
+
+PaletteIndex loads every palette once (96/192/768 bytes, VGA 6-bit scaled)
+into one (m, 256, 3) matrix and scores all of them at once:
+
+- raw index buffer: index-usage coverage (pixels whose index the palette
+  defines; a 192-byte chunk is placed like parse_palette places it) and how
+  smooth the picture is under the palette - neighboring pixels of a real
+  image are close in color, under a wrong palette they look like noise.
+  The mean squared neighbor distance is divided by that of two random
+  pixels, so noise scores ~1 and the right palette far less.
+- screenshot: nearest-color error of its colors, weighted by pixel count,
+  and coverage = share of pixels that have an almost exact match.
+
+Lower score is better.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+from .palette import guess_palette_base, scale_vga6
+from .quantize import rgb_pixels
+
+PALETTE_SIZES = (96, 192, 768)
+
+# screenshot colors compared per palette, the most used ones
+MAX_COLORS = 4096
+# RGB distance counted as "the same color" for screenshot coverage
+MATCH_DISTANCE = 16.0
+
+
+@dataclass(frozen=True)
+class PaletteMatch:
+    path: Path
+    score: float
+    coverage: float
+    error: float
+
+
+class PaletteIndex:
+    def __init__(self, paths: Iterable[Union[str, Path]]):
+        self.paths: List[Path] = []
+        chunks = []
+        ncolors = []
+        for p in sorted(Path(p) for p in paths):
+            try:
+                data = p.read_bytes()
+            except OSError:
+                continue
+            if len(data) not in PALETTE_SIZES:
+                continue
+            chunk = np.zeros((256, 3), dtype=np.float32)
+            rgb = np.array(scale_vga6(list(data)), dtype=np.float32).reshape(-1, 3)
+            chunk[:len(rgb)] = rgb
+            chunks.append(chunk)
+            ncolors.append(len(rgb))
+            self.paths.append(p)
+        self.chunks = np.array(chunks, dtype=np.float32).reshape(-1, 256, 3)
+        self.ncolors = np.array(ncolors, dtype=np.int64)
+
+    @classmethod
+    def from_dirs(cls, dirs: Iterable[Union[str, Path]], recursive: bool = True) -> "PaletteIndex":
+        """Every *.PAL / *.pal under dirs."""
+        found = set()
+        for d in dirs:
+            d = Path(d)
+            if d.is_dir():
+                files = d.rglob("*") if recursive else d.iterdir()
+                found.update(p for p in files if p.suffix.lower() == ".pal" and p.is_file())
+        return cls(found)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def placed(self, base: int):
+        """(m, 256, 3) colors and (m, 256) defined mask, 192-byte chunks placed at base."""
+        shift = np.where(self.ncolors == 64, (base // 64) * 64, 0)
+        src = np.arange(256)[None, :] - shift[:, None]
+        valid = (src >= 0) & (src < self.ncolors[:, None])
+        rgb = self.chunks[np.arange(len(self))[:, None], np.clip(src, 0, 255)]
+        return rgb, valid
+
+    def _top(self, score, coverage, error, k: int) -> List[PaletteMatch]:
+        order = np.lexsort((np.arange(len(score)), -coverage, score))[:k]
+        return [PaletteMatch(self.paths[i], float(score[i]), float(coverage[i]), float(error[i]))
+                for i in order]
+
+    def match_indices(self, pixels, k: int = 5, palette_offset: Optional[int] = None) -> List[PaletteMatch]:
+        """Top-k palettes for a raw 8bpp index buffer (bytes or uint8 array)."""
+        if not len(self):
+            return []
+        idx = np.frombuffer(pixels, dtype=np.uint8) if not isinstance(pixels, np.ndarray) else pixels.ravel()
+        counts = np.bincount(idx, minlength=256).astype(np.float64)
+        total = counts.sum() or 1.0
+
+        base = palette_offset if palette_offset is not None else guess_palette_base(idx.tobytes())
+        rgb, valid = self.placed(base)
+        coverage = (valid * counts[None, :]).sum(axis=1) / total
+
+        # neighbor pairs (a, b): mean |rgb[a] - rgb[b]|^2 under each palette ...
+        # = sum W[a,b] (|a|^2 + |b|^2 - 2 a.b), one (m,256)x(256,256) product per channel
+        pair = np.bincount(idx[:-1].astype(np.int64) * 256 + idx[1:], minlength=65536)
+        pair = pair.reshape(256, 256).astype(np.float64)
+        np.fill_diagonal(pair, 0.0)
+        n_pairs = pair.sum()
+        if not n_pairs:
+            return self._top(1.0 - coverage, coverage, np.zeros(len(self)), k)
+        c = rgb.astype(np.float64)
+        sq = (c ** 2).sum(axis=2)
+        cross = sum(((c[:, :, ch] @ pair) * c[:, :, ch]).sum(axis=1) for ch in range(3))
+        near = (sq @ pair.sum(axis=1) + sq @ pair.sum(axis=0) - 2.0 * cross) / n_pairs
+
+        # ... compared to two random pixels of the asset: E|X-Y|^2 = 2 * variance
+        p = counts / total
+        mean = np.einsum("mic,i->mc", c, p)
+        spread = 2.0 * (sq @ p - (mean ** 2).sum(axis=1))
+
+        error = np.where(spread > 0, near / np.maximum(spread, 1e-9), 1.0)
+        return self._top((1.0 - coverage) + error, coverage, error, k)
+
+    def match_image(self, img: Image.Image, k: int = 5,
+                    composite_bg=(0, 0, 0)) -> List[PaletteMatch]:
+        """Top-k palettes for a true-color screenshot."""
+        if not len(self):
+            return []
+        # exact colors and how many pixels have each
+        rgb = rgb_pixels(img, composite_bg).astype(np.int64)
+        colors, weights = np.unique((rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2], return_counts=True)
+        if len(colors) > MAX_COLORS:
+            keep = np.sort(np.argsort(-weights, kind="stable")[:MAX_COLORS])
+            colors, weights = colors[keep], weights[keep]
+        points = np.stack([colors >> 16, (colors >> 8) & 255, colors & 255], axis=1).astype(np.float32)
+        weights = weights / weights.sum()
+
+        error = np.empty(len(self))
+        coverage = np.empty(len(self))
+        pp = (points ** 2).sum(axis=1)[:, None]
+        for i in range(len(self)):
+            pal = self.chunks[i, :self.ncolors[i]]
+            d2 = pp - 2.0 * points @ pal.T + (pal ** 2).sum(axis=1)[None, :]
+            d = np.sqrt(np.maximum(d2.min(axis=1), 0.0))
+            error[i] = (d * weights).sum()
+            coverage[i] = weights[d <= MATCH_DISTANCE].sum()
+        return self._top(error, coverage, error, k)
+
+    def match_file(self, path: Union[str, Path], k: int = 5) -> List[PaletteMatch]:
+        """Raw asset (.bin etc.) or any image Pillow can open."""
+        path = Path(path)
+        try:
+            with Image.open(path) as img:
+                img.load()
+                if img.mode != "P":
+                    return self.match_image(img, k)
+                return self.match_indices(np.asarray(img), k)
+        except (OSError, ValueError):
+            return self.match_indices(path.read_bytes(), k)
+
+
+def best_palettes(asset: Union[str, Path], palettes: Sequence[Union[str, Path]], k: int = 5) -> List[PaletteMatch]:
+    """One-off helper; keep a PaletteIndex around to score many assets."""
+    return PaletteIndex(palettes).match_file(asset, k)
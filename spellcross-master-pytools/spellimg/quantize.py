@@ -0,0 +1,181 @@
+"""
+Palette from true-color screenshots.
+
+All frames go into one 32x32x32 histogram (per bin: pixel count and the sum
+of the exact colors, so each bin stands for its mean color). A weighted median
+cut over the occupied bins gives the starting palette, weighted k-means on
+the same bins refines it. Sums and counts do not depend on the order of the
+frames, so neither does the palette.
+
+Locked entries (index -> RGB, e.g. index 0 black or a fixed UI range taken
+from an existing .PAL) are kept as they are; pixels close to them are
+counted as covered and do not pull the free entries.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+BITS = 5
+BINS = 1 << (3 * BITS)
+
+
+def rgb_pixels(img: Image.Image, composite_bg: Tuple[int, int, int] = (0, 0, 0)) -> np.ndarray:
+    """Any image -> (n, 3) uint8, alpha composited over composite_bg."""
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        bg = Image.new("RGBA", img.size, (*composite_bg, 255))
+        img = Image.alpha_composite(bg, img)
+    return np.asarray(img.convert("RGB"), dtype=np.uint8).reshape(-1, 3)
+
+
+class ColorHistogram:
+    """Pixel count and color sum per 5-bit RGB bin, accumulated over any number of frames."""
+
+    def __init__(self):
+        self.counts = np.zeros(BINS, dtype=np.int64)
+        self.sums = np.zeros((BINS, 3), dtype=np.int64)
+
+    def add_pixels(self, rgb: np.ndarray) -> None:
+        shift = 8 - BITS
+        q = (rgb >> shift).astype(np.int64)
+        idx = (q[:, 0] << (2 * BITS)) | (q[:, 1] << BITS) | q[:, 2]
+        self.counts += np.bincount(idx, minlength=BINS)
+        for c in range(3):
+            self.sums[:, c] += np.bincount(idx, weights=rgb[:, c], minlength=BINS).astype(np.int64)
+
+    def add_image(self, img: Image.Image, composite_bg: Tuple[int, int, int] = (0, 0, 0)) -> None:
+        self.add_pixels(rgb_pixels(img, composite_bg))
+
+    def colors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(mean color of each occupied bin as float64 (m, 3), its pixel count (m,))."""
+        occupied = np.flatnonzero(self.counts)
+        weights = self.counts[occupied]
+        return self.sums[occupied] / weights[:, None], weights.astype(np.float64)
+
+
+def _box_sse(points: np.ndarray, weights: np.ndarray) -> float:
+    mean = np.average(points, axis=0, weights=weights)
+    return float((weights[:, None] * (points - mean) ** 2).sum())
+
+
+def median_cut(points: np.ndarray, weights: np.ndarray, k: int) -> np.ndarray:
+    """
+    Up to k weighted means. The box with the largest weighted squared error
+    is split at the weighted median of its widest channel, until k boxes.
+    """
+    if len(points) == 0 or k <= 0:
+        return np.zeros((0, 3))
+    boxes = [np.arange(len(points))]
+    sse = [_box_sse(points, weights)]
+    while len(boxes) < k:
+        i = int(np.argmax(sse))
+        if sse[i] <= 0:
+            break
+        box = boxes[i]
+        p = points[box]
+        axis = int(np.argmax(p.max(axis=0) - p.min(axis=0)))
+        order = np.argsort(p[:, axis], kind="stable")
+        cum = np.cumsum(weights[box][order])
+        cut = int(np.searchsorted(cum, cum[-1] / 2))
+        cut = min(max(cut, 1), len(box) - 1)   # both halves non-empty
+        lo, hi = box[order[:cut]], box[order[cut:]]
+        boxes[i:i + 1] = [lo, hi]
+        sse[i:i + 1] = [_box_sse(points[lo], weights[lo]), _box_sse(points[hi], weights[hi])]
+    return np.array([np.average(points[b], axis=0, weights=weights[b]) for b in boxes])
+
+
+def nearest(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Index of the nearest center (squared RGB distance, lowest index on ties) for every point."""
+    # float32 is plenty for 0..255 colors and halves the work
+    p = points.astype(np.float32)
+    c = centers.astype(np.float32)
+    d = (c ** 2).sum(axis=1)[None, :] - 2.0 * (p @ c.T)
+    return np.argmin(d, axis=1)
+
+
+def kmeans(points: np.ndarray, weights: np.ndarray, centers: np.ndarray,
+           fixed: Optional[np.ndarray] = None, iterations: int = 8) -> np.ndarray:
+    """
+    Weighted Lloyd iterations starting from centers. fixed: colors that
+    attract points but never move (locked entries). Empty centers stay put.
+    """
+    centers = centers.astype(np.float64).copy()
+    fixed = np.zeros((0, 3)) if fixed is None else np.asarray(fixed, dtype=np.float64)
+    k = len(centers)
+    for _ in range(iterations):
+        label = nearest(points, np.vstack([centers, fixed]))
+        free = label < k
+        w = np.bincount(label[free], weights=weights[free], minlength=k)
+        moved = centers.copy()
+        for c in range(3):
+            s = np.bincount(label[free], weights=weights[free] * points[free, c], minlength=k)
+            moved[:, c] = np.where(w > 0, s / np.maximum(w, 1e-12), centers[:, c])
+        if np.allclose(moved, centers, atol=0.05):
+            centers = moved
+            break
+        centers = moved
+    return centers
+
+
+def quantize_histogram(
+    hist: ColorHistogram,
+    colors: int = 256,
+    locked: Optional[Dict[int, Tuple[int, int, int]]] = None,
+    iterations: int = 8,
+) -> List[int]:
+    """
+    Palette of `colors` entries from a histogram, as 768 ints (unused tail = 0).
+    locked: {index: (r, g, b)} kept exactly; the free entries fill the other
+    indices, most used first.
+    """
+    locked = {i: tuple(rgb) for i, rgb in (locked or {}).items() if 0 <= i < colors}
+    points, weights = hist.colors()
+    fixed = np.array([locked[i] for i in sorted(locked)], dtype=np.float64).reshape(-1, 3)
+
+    free_n = colors - len(locked)
+    if len(fixed) and len(points):
+        # pixels already (almost) matched by a locked entry need no free entry
+        d = ((points[:, None, :] - fixed[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        keep = d > 3 * (1 << (8 - BITS)) ** 2 / 4
+        init = median_cut(points[keep], weights[keep], free_n)
+    else:
+        init = median_cut(points, weights, free_n)
+
+    centers = kmeans(points, weights, init, fixed, iterations) if iterations and len(init) else init
+
+    # most used first, ties by color, so the order is reproducible
+    rgb = np.clip(np.rint(centers), 0, 255).astype(np.int64)
+    if len(rgb):
+        label = nearest(points, np.vstack([centers, fixed]))
+        use = np.bincount(label, weights=weights, minlength=len(centers) + len(fixed))[:len(centers)]
+        rgb = rgb[np.lexsort((rgb[:, 2], rgb[:, 1], rgb[:, 0], -use))]
+
+    pal = [0] * 768
+    free_idx = (i for i in range(colors) if i not in locked)
+    for i, rgb_i in zip(free_idx, rgb.tolist()):
+        pal[3 * i:3 * i + 3] = rgb_i
+    for i, rgb_i in locked.items():
+        pal[3 * i:3 * i + 3] = [max(0, min(255, int(v))) for v in rgb_i]
+    return pal
+
+
+def palette_from_images(
+    images: Iterable[Image.Image],
+    colors: int = 256,
+    locked: Optional[Dict[int, Tuple[int, int, int]]] = None,
+    iterations: int = 8,
+    composite_bg: Tuple[int, int, int] = (0, 0, 0),
+) -> List[int]:
+    hist = ColorHistogram()
+    for img in images:
+        hist.add_image(img, composite_bg)
+    return quantize_histogram(hist, colors, locked, iterations)
+
+
+def locked_from_palette(pal: Sequence[int], indices: Iterable[int]) -> Dict[int, Tuple[int, int, int]]:
+    """{index: rgb} for the given indices of a 768-int palette (e.g. a fixed UI range)."""
+    return {i: tuple(pal[3 * i:3 * i + 3]) for i in indices if 3 * i + 3 <= len(pal)}
@@ -0,0 +1,104 @@
+"""
+Geometric transforms of (height, width) index arrays.
+
+All of them return strided views of the input, so a chain of transforms
+only composes strides (colmajor followed by transpose is the original
+buffer again) and no pixel is copied until the result becomes an image
+(to_image) or bytes.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+TRANSFORMS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {}
+
+
+def register_transform(*names: str) -> Callable:
+    def wrap(fn: Callable[[np.ndarray], np.ndarray]) -> Callable[[np.ndarray], np.ndarray]:
+        for name in names:
+            TRANSFORMS[name] = fn
+        return fn
+    return wrap
+
+
+@register_transform("none", "", "0")
+def identity(a: np.ndarray) -> np.ndarray:
+    return a
+
+
+@register_transform("fliph", "flipx", "mirror", "h")
+def flip_h(a: np.ndarray) -> np.ndarray:
+    return a[:, ::-1]
+
+
+@register_transform("flipv", "flipy", "v")
+def flip_v(a: np.ndarray) -> np.ndarray:
+    return a[::-1, :]
+
+
+@register_transform("transpose", "swapxy", "t")
+def transpose(a: np.ndarray) -> np.ndarray:
+    return a.T
+
+
+@register_transform("rot90cw", "cw", "r90")
+def rot90_cw(a: np.ndarray) -> np.ndarray:
+    return np.rot90(a, -1)
+
+
+@register_transform("rot90ccw", "ccw", "l90")
+def rot90_ccw(a: np.ndarray) -> np.ndarray:
+    return np.rot90(a, 1)
+
+
+@register_transform("colmajor", "col")
+def colmajor(a: np.ndarray) -> np.ndarray:
+    """Reinterpret a decoded buffer stored as idx = x * height + y (a must be contiguous)."""
+    height, width = a.shape
+    return a.reshape(width, height).T
+
+
+def transform_view(a: np.ndarray, transform: str) -> np.ndarray:
+    try:
+        fn = TRANSFORMS[(transform or "none").strip().lower()]
+    except KeyError:
+        raise ValueError(f"Unknown transform: {transform}") from None
+    return fn(a)
+
+
+def compose(a: np.ndarray, *transforms: str) -> np.ndarray:
+    """Apply transforms left to right, still a view of a."""
+    for transform in transforms:
+        a = transform_view(a, transform)
+    return a
+
+
+def colmajor_view(img8: bytes, width: int, height: int) -> np.ndarray:
+    """Pixels stored as idx = x * height + y, seen as a (height, width) array."""
+    return np.frombuffer(img8, dtype=np.uint8, count=width * height).reshape(width, height).T
+
+
+def reorder_colmajor_to_rowmajor(img8: bytes, width: int, height: int) -> bytes:
+    return colmajor_view(img8, width, height).tobytes()
+
+
+def apply_transform(img8: bytes, width: int, height: int, transform: str) -> Tuple[bytes, int, int]:
+    """Transform row-major indexed pixels, returns (pixels, new width, new height)."""
+    if len(img8) != width * height:
+        raise ValueError("transform expects img8 size == w*h")
+    out = transform_view(np.frombuffer(img8, dtype=np.uint8).reshape(height, width), transform)
+    return out.tobytes(), out.shape[1], out.shape[0]
+
+
+def to_image(a: np.ndarray, mode: str = "P") -> Image.Image:
+    """
+    (height, width) index array (or view) -> PIL image. A strided view is
+    gathered into one contiguous copy here; a contiguous array is shared.
+    """
+    a = np.ascontiguousarray(a)
+    return Image.frombuffer(mode, (a.shape[1], a.shape[0]), a, "raw", mode, 0, 1)
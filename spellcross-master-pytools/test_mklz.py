@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""mklz.pack_bytes output read back by every unlz decoder, at 9..12-bit code caps."""
+
+import io
+import random
+
+import pytest
+
+import mklz
+import unlz
+
+WIDTHS = [9, 10, 11, 12]
+
+
+def random_bytes(n, seed=0):
+    return random.Random(seed).randbytes(n)
+
+
+INPUTS = {
+    'empty': b'',
+    'single-byte': b'A',
+    'long-run': b'\0' * 100000,
+    'random': random_bytes(5000),
+    'all-256': bytes(range(256)) * 8,
+    # random data never repeats a long prefix, so the dictionary fills
+    # up (and is cleared) after every ~250..3800 codes depending on the cap
+    'multi-clear': random_bytes(60000, seed=1),
+}
+
+
+def segments(packed):
+    initial, bits_per_symbol, stream = unlz.parse_header(packed)
+    return unlz.read_codes(stream, len(initial), bits_per_symbol)
+
+
+@pytest.mark.parametrize('bits', WIDTHS)
+@pytest.mark.parametrize('name', INPUTS)
+def test_round_trip(name, bits):
+    data = INPUTS[name]
+    packed = mklz.pack_bytes(data, max_bits_per_symbol=bits)
+
+    assert unlz.unpack(io.BytesIO(packed)) == data
+    assert unlz.unpack_bytes(packed) == data
+    assert b''.join(unlz.iter_unpack(io.BytesIO(packed))) == data
+
+
+@pytest.mark.parametrize('bits', WIDTHS)
+def test_codes_fit_the_cap(bits):
+    for data in INPUTS.values():
+        for codes in segments(mklz.pack_bytes(data, max_bits_per_symbol=bits)):
+            assert len(codes) == 0 or int(codes.max()) < (1 << bits)
+
+
+@pytest.mark.parametrize('bits', WIDTHS)
+def test_multi_clear_resets_dictionary(bits):
+    assert len(segments(mklz.pack_bytes(INPUTS['multi-clear'], max_bits_per_symbol=bits))) > 2
+
+
+def test_all_256_omits_dictionary():
+    packed = mklz.pack_bytes(INPUTS['all-256'])
+    assert packed[:2] == (256).to_bytes(2, 'little')
+    assert len(unlz.parse_header(packed)[0]) == 256
+
+
+def test_cap_too_small():
+    with pytest.raises(ValueError):
+        mklz.pack_bytes(bytes(range(256)), max_bits_per_symbol=8)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Size inference (spellimg.dims) on buffers whose size is not in known_sizes.json."""
+
+import numpy as np
+
+import spellimg
+from spellimg import dims
+from spell_rawimg_tool_v4 import infer_dims_by_area
+
+
+def smooth_image(width, height):
+    y, x = np.mgrid[0:height, 0:width]
+    return ((x * 2 + y * 3) // 4 + np.sin(x / 9.0) * 6 + 20).astype(np.uint8)
+
+
+def test_size_not_known():
+    assert (500, 300) not in dims.known_sizes() and (300, 500) not in dims.known_sizes()
+
+
+def test_row_major():
+    img = smooth_image(500, 300)
+    assert spellimg.infer_dims(img.size, img.tobytes(), min_h=50, max_h=3000) == (500, 300)
+
+
+def test_column_major():
+    # what --ui-layout stores: 500 columns of 300 pixels, idx = x * 300 + y
+    img = smooth_image(500, 300)
+    colmajor = img.T.tobytes()
+    assert spellimg.infer_dims(img.size, colmajor, min_h=50, max_h=3000, transposed=True) == (500, 300)
+    assert infer_dims_by_area(img.size, colmajor, transposed=True) == (500, 300)
+
+
+def test_column_major_decodes_like_explicit_size():
+    img = smooth_image(500, 300)
+    w, h = infer_dims_by_area(img.size, img.T.tobytes(), transposed=True)
+    idx = np.frombuffer(img.T.tobytes(), dtype=np.uint8).reshape(h, w)
+    assert np.array_equal(spellimg.colmajor(idx), img)
+
+
+def test_learn_size_writes_user_file(tmp_path, monkeypatch):
+    shipped = dims.KNOWN_SIZES_FILE.read_bytes()
+    user = tmp_path / "sizes.json"
+    monkeypatch.setenv("SPELLIMG_SIZES", str(user))
+    monkeypatch.setattr(dims, "_known_sizes", None)
+    monkeypatch.setattr(dims, "_cache", type(dims._cache)())
+
+    dims.learn_size(123, 457)
+    assert dims.KNOWN_SIZES_FILE.read_bytes() == shipped
+    assert user.exists()
+    monkeypatch.setattr(dims, "_known_sizes", None)
+    assert (123, 457) in dims.known_sizes()
+    assert dims.infer_dims(123 * 457) == (123, 457)
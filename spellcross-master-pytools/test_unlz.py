@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""unlz.LZFile as a stream: records, forward seeks, buffered reads."""
+
+import io
+import random
+import struct
+
+import mklz
+import unlz
+
+DATA = random.Random(2).randbytes(50003)
+
+
+def open_lz(data=DATA):
+    return unlz.LZFile(io.BytesIO(mklz.pack_bytes(data)))
+
+
+def test_read_records_keeps_partial_record():
+    lz = open_lz()
+    assert lz.read(1) == DATA[:1]
+    assert len(list(lz.read_records('<I'))) == 50000 // 4
+    assert lz.tell() == 50001
+    assert lz.read() == DATA[-2:]
+
+
+def test_read_records_count():
+    lz = open_lz()
+    assert list(lz.read_records(struct.Struct('<H'), 2)) == [
+        struct.unpack_from('<H', DATA, 0), struct.unpack_from('<H', DATA, 2)]
+    assert lz.tell() == 4
+
+
+def test_seek():
+    lz = open_lz()
+    assert lz.seek(10) == 10
+    assert lz.read(5) == DATA[10:15]
+    assert lz.seek(0, io.SEEK_END) == len(DATA)
+    assert lz.read(1) == b''
+    assert lz.seek(-5, io.SEEK_CUR) == len(DATA) - 5
+    assert lz.read() == DATA[-5:]
+    assert lz.seek(3) == 3
+    assert lz.read(4) == DATA[3:7]
+    assert lz.seek(len(DATA) + 10) == len(DATA) + 10
+    assert lz.read() == b''
+
+
+def test_buffered():
+    f = io.BufferedReader(open_lz())
+    assert f.read() == DATA
+    f.seek(100)
+    assert f.read(10) == DATA[100:110]
+
+
+def test_decode_into_reuses_decoder():
+    decoder = unlz.LZDecoder()
+    for data in (DATA, b'abc' * 40, DATA[:20000] * 3):
+        packed = mklz.pack_bytes(data)
+        buf = bytearray(len(data) + 7)
+        assert decoder.decode_into(packed, buf) == len(data)
+        assert bytes(buf[:len(data)]) == data
+        assert decoder.decode(packed) == data
+
+
+def test_decode_into_too_small():
+    try:
+        unlz.LZDecoder().decode_into(mklz.pack_bytes(DATA), bytearray(100))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('no error for a too small buffer')
@@ -1,38 +1,325 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+import mmap
+import json
 import struct
+import hashlib
 import logging
+import fnmatch
+import threading
+from collections import OrderedDict
 
+import unlz
 import utils
 
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger('unfs')
 
-def main():
-    fsname = sys.argv[1]
-    dirname = sys.argv[2]
+# which files FSArchive.load() decompresses, same as FSarchive::Options
+DELZ_LZ = 0x01
+DELZ_LZ0 = 0x02
+DELZ_ALL = DELZ_LZ | DELZ_LZ0
+
+# nested LZ streams are unpacked at most this many times
+DELZ_MAX_DEPTH = 4
+
+class LRUCache:
+    """ Thread-safe least recently used cache bounded by total value size. """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+
+            self.items[key] = value
+            self.size += len(value)
+
+            # the newest item stays even if it alone is over the limit
+            while self.size > self.max_bytes and len(self.items) > 1:
+                _, dropped = self.items.popitem(last=False)
+                self.size -= len(dropped)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+# decompressed files shared by all archives,
+# keyed by (archive path, file name, archive mtime)
+DELZ_CACHE = LRUCache(64 << 20)
+
+def looks_like_lz(data):
+    """ Conservative check whether data is (another) Spellcross LZ stream,
+        the same heuristic the map editor uses for double-packed files.
+    """
+    if len(data) < 4:
+        return False
+
+    dict_size, bits_per_symbol = struct.unpack_from('<HB', data)
+    if dict_size < 2 or dict_size > 512:
+        return False
+    if bits_per_symbol < 8 or bits_per_symbol > 13:
+        return False
+
+    header = 3 if dict_size & 0x100 else 3 + dict_size
+    return header < len(data)
+
+class FSArchive:
+    """ Random access to the files inside a .FS archive.
+
+        The archive is memory-mapped and its directory is parsed once into
+        a name index, so any file can be read without extracting the rest.
+        Names are matched case-insensitively, like in the map editor.
+
+        With delz (DELZ_LZ, DELZ_LZ0 or DELZ_ALL), load() decompresses .LZ/.LZ0
+        files on first access and keeps the result in an LRU cache, so later
+        loads of the same file cost nothing.
+    """
+
+    def __init__(self, path, delz=0, cache=DELZ_CACHE):
+        self.path = path
+        self.delz = delz
+        self.cache = cache
+        self.f = open(path, 'rb')
+        self.mtime = os.fstat(self.f.fileno()).st_mtime_ns
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
 
-    index = []
-    with open(sys.argv[1], 'rb') as f:
         # uint32_t = entry_count
-        entry_count = struct.unpack('<i', f.read(4))[0]
+        entry_count = struct.unpack_from('<i', self.view)[0]
         log.debug('entry_count = %d' % entry_count)
 
-        for _ in range(entry_count):
-            # char[13] = filename, including dot, right-zero-padded
-            # uint32_t = offset from the beginning of the FS file
-            # uint32_t = length
-            fname_raw, offset, length = struct.unpack('<13sLL', f.read(21))
-            fname = utils.from_c_string(fname_raw)
-            index.append((fname, offset, length))
+        # char[13] = filename, including dot, right-zero-padded
+        # uint32_t = offset from the beginning of the FS file
+        # uint32_t = length
+        directory = self.view[4:4 + 21*entry_count]
+        if len(directory) != 21*entry_count:
+            raise ValueError('%s: truncated directory' % path)
+
+        self.entries = []
+        self.index = {}
+        fnames = utils.from_c_strings(directory, 13, stride=21)
+        for fname, (offset, length) in zip(fnames, struct.iter_unpack('<13xLL', directory)):
+            if offset + length > len(self.view):
+                raise ValueError('%s: %s (%d +%d bytes) is past the end of archive'
+                    % (path, fname, offset, length))
+
+            self.entries.append((fname, offset, length))
+            self.index[fname.upper()] = (offset, length)
+
+    def close(self):
+        self.view.release()
+        try:
+            self.mm.close()
+        except BufferError:
+            # somebody still holds a view of a file, the mapping goes away with it
+            pass
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name.upper() in self.index
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def names(self):
+        """ All file names, in archive order. """
+        return [fname for fname, _, _ in self.entries]
+
+    def iter_names(self, pattern='*'):
+        """ File names matching a wildcard pattern (*, ?), like GetFileNames(). """
+        for fname, _, _ in self.entries:
+            if fnmatch.fnmatchcase(fname, pattern):
+                yield fname
+
+    def open(self, name):
+        """ Zero-copy memoryview of a file. Raises KeyError if there is none. """
+        offset, length = self.index[name.upper()]
+        return self.view[offset:offset+length]
+
+    def read(self, name):
+        return bytes(self.open(name))
+
+    def is_delz(self, name):
+        """ Whether load() decompresses this file. """
+        ext = os.path.splitext(name)[1].upper()
+        return (ext == '.LZ' and self.delz & DELZ_LZ) or (ext == '.LZ0' and self.delz & DELZ_LZ0)
+
+    def load(self, name):
+        """ Like open(), but .LZ/.LZ0 files come decompressed if enabled. """
+        if not self.is_delz(name):
+            return self.open(name)
+
+        key = (os.path.abspath(self.path), name.upper(), self.mtime)
+        data = self.cache.get(key)
+        if data is None:
+            # one decoder per thread, loads may run in parallel
+            decoder = unlz.shared_decoder()
+            data = self.open(name)
+            for _ in range(DELZ_MAX_DEPTH):
+                data = decoder.decode(data)
+                if not looks_like_lz(data):
+                    break
+
+            self.cache.put(key, data)
+
+        return memoryview(data)
+
+# payloads are copied to disk in pieces of this size
+WRITE_CHUNK = 1 << 20
+
+# what was extracted into a folder and from which archive, kept in that folder
+MANIFEST_NAME = '.unfs_manifest.json'
+
+def load_manifest(dirname):
+    try:
+        with open(os.path.join(dirname, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(dirname, manifest):
+    path = os.path.join(dirname, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def write_file(path, data, progress=None):
+    with open(path, 'wb', buffering=0) as g:
+        for start in range(0, len(data), WRITE_CHUNK):
+            chunk = data[start:start + WRITE_CHUNK]
+            g.write(chunk)
+            if progress is not None:
+                progress(len(chunk))
+
+def output_ok(path, length):
+    try:
+        return os.stat(path).st_size == length
+    except OSError:
+        return False
+
+def extract(fsname, dirname, progress=None, cancel=None, manifest=None):
+    """ Extract every file of an archive into dirname.
+
+        progress(nbytes) is called after each chunk written, cancel is
+        a threading.Event checked between files. Returns the number of
+        files written.
+
+        With a manifest (see load_manifest), only files that are new or
+        changed since the last run, or missing on disk, are written, and
+        outputs of files gone from the archive are deleted. The archive's
+        entry in the manifest is updated in place; saving it is up to the
+        caller, so several archives can share one folder; extract those
+        one after another, not in parallel threads on the same manifest.
+    """
+    if manifest is None:
+        count = 0
+        with FSArchive(fsname) as fs:
+            for fname, offset, length in fs.entries:
+                if cancel is not None and cancel.is_set():
+                    break
+
+                log.debug('unpacking %s: %d +%d bytes' % (fname, offset, length))
+                write_file(os.path.join(dirname, fname), fs.view[offset:offset+length], progress)
+                count += 1
+        return count
+
+    key = os.path.basename(fsname)
+    st = os.stat(fsname)
+    old = manifest.get(key) or {}
+    old_files = old.get('files', {})
+
+    count = 0
+    files = {}
+    canceled = False
+    with FSArchive(fsname) as fs:
+        # size+mtime match -> same archive, no need to hash anything
+        unchanged = old.get('size') == st.st_size and old.get('mtime_ns') == st.st_mtime_ns
+        archive_hash = old.get('hash') if unchanged else content_hash(fs.view)
+        unchanged = unchanged or archive_hash == old.get('hash')
+
+        for fname, offset, length in fs.entries:
+            if cancel is not None and cancel.is_set():
+                canceled = True
+                break
+
+            path = os.path.join(dirname, fname)
+            prev = old_files.get(fname)
+            data = fs.view[offset:offset+length]
+            if unchanged and prev is not None and prev[:2] == [offset, length]:
+                digest = prev[2]
+            else:
+                digest = content_hash(data)
+
+            files[fname] = [offset, length, digest]
+            if prev is not None and prev[2] == digest and output_ok(path, length):
+                continue
 
-        for fname, offset, length in index:
             log.debug('unpacking %s: %d +%d bytes' % (fname, offset, length))
-            assert f.tell() == offset
-            payload = f.read(length)
-            with open('%s/%s' % (dirname, fname), 'wb') as g:
-                g.write(payload)
+            write_file(path, data, progress)
+            count += 1
+
+    if canceled:
+        # files not reached yet keep their old record, the archive is rechecked next time
+        manifest[key] = {'files': dict(old_files, **files)}
+        return count
+
+    # outputs of files gone from the archive, unless another archive wrote them too
+    claimed = set()
+    for other, entry in list(manifest.items()):
+        if other != key:
+            claimed.update(entry.get('files', {}))
+    for fname in old_files.keys() - files.keys() - claimed:
+        log.info('removing %s, no longer in %s' % (fname, key))
+        try:
+            os.remove(os.path.join(dirname, fname))
+        except FileNotFoundError:
+            pass
+
+    manifest[key] = {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'hash': archive_hash,
+        'files': files,
+    }
+    return count
+
+def main():
+    fsname, dirname = sys.argv[1], sys.argv[2]
+    manifest = load_manifest(dirname)
+    try:
+        count = extract(fsname, dirname, manifest=manifest)
+    finally:
+        save_manifest(dirname, manifest)
+    log.info('%d file(s) written' % count)
 
 if __name__ == '__main__':
     main()
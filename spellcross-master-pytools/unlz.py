@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
 
+import io
 import sys
 import struct
 import logging
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger('unlz')
 
+# code streams shorter than this are decoded by the pure Python loop
+NUMPY_MIN_STREAM = 1024
+
 # quick'n'dirty bitstream reader
 class Bits:
     def __init__(self, f):
@@ -43,29 +53,89 @@ class Bits:
 
         return result
 
-class LZFile:
+class LZFile(io.RawIOBase):
+    """ Read-only stream of the decompressed contents of an LZ file.
+
+        The whole file is decoded by LZDecoder on the first read, so it
+        can be wrapped in io.BufferedReader or read record by record
+        without going through iter_unpack byte by byte. The data is in
+        memory, so seeking works anywhere, like in a BytesIO.
+    """
+
     def __init__(self, f):
-        self.iter = iter_unpack(f)
-        self.buf = b''
+        self.f = f
+        self.buf = None
+        self.pos = 0
 
-    def read(self, nbytes):
-        result = b''
+    def readable(self):
+        return True
 
-        while True:
-            if len(self.buf) >= nbytes:
-                result += self.buf[:nbytes]
-                self.buf = self.buf[nbytes:]
-                return result
-            else:
-                result += self.buf
-                nbytes -= len(self.buf)
-                try:
-                    self.buf = next(self.iter)
-                except StopIteration:
-                    return None
+    def seekable(self):
+        return True
+
+    def fill(self):
+        """ Decode the file if not done yet. Returns the number of bytes left. """
+        if self.buf is None:
+            self.buf = unpack_bytes(self.f.read())
+        return max(0, len(self.buf) - self.pos)
+
+    def readinto(self, b):
+        with memoryview(b) as view, view.cast('B') as view:
+            n = min(len(view), self.fill())
+            view[:n] = self.buf[self.pos:self.pos + n]
+
+        self.pos += n
+        return n
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.readall()
 
-    def __iter__(self):
-        return self.iter
+        n = min(size, self.fill())
+        data = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return data
+
+    def readall(self):
+        return self.read(self.fill())
+
+    def read_records(self, fmt, count=-1):
+        """ struct.iter_unpack() over the next count records of fmt (a format
+            string or struct.Struct), or all remaining whole records if count < 0.
+
+            Only whole records are read, a trailing partial record stays
+            in the stream.
+        """
+        if not isinstance(fmt, struct.Struct):
+            fmt = struct.Struct(fmt)
+
+        left = self.fill()
+        n = left - left % fmt.size
+        if count >= 0:
+            n = min(n, count * fmt.size)
+        return fmt.iter_unpack(self.read(n))
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            target = offset
+        elif whence == io.SEEK_CUR:
+            target = self.pos + offset
+        elif whence == io.SEEK_END:
+            # the size is only known once everything is decoded
+            self.fill()
+            target = len(self.buf) + offset
+        else:
+            raise ValueError('invalid whence (%r)' % whence)
+
+        if target < 0:
+            raise ValueError('negative seek position %d' % target)
+
+        # past the end is fine, reads there just return nothing
+        self.pos = target
+        return self.pos
 
 
 # The algorithm follows
@@ -147,10 +217,423 @@ def iter_unpack(f):
 
         yield symbol
 
+def parse_header(data):
+    """ Split an in-memory LZ stream into
+        (initial dictionary, initial bits per symbol, code stream).
+    """
+    data = memoryview(data)
+
+    # uint16_t = initial dictionary size
+    # uint8_t  = initial bits per symbol
+    dict_size, bits_per_symbol = struct.unpack_from('<HB', data)
+    pos = 3
+
+    if dict_size < 256:
+        initial = bytes(data[pos:pos+dict_size])
+        pos += dict_size
+    else:
+        initial = bytes(range(256))
+
+    return initial, bits_per_symbol, data[pos:]
+
+def width_schedule(clear_code, bits_per_symbol, count):
+    """ Bits per symbol of the first `count` codes after a CLEAR.
+
+        Returns a list of (bits, repeat) runs. The width depends only on
+        how many symbols have been added since the last CLEAR, not on the
+        symbols themselves, so it can be computed up front.
+    """
+    runs = []
+    n = 0
+    while n < count:
+        # the width goes up once this many symbols have been added
+        last = max(n, (1 << bits_per_symbol) - clear_code - 2)
+        runs.append((bits_per_symbol, min(last + 1, count) - n))
+        n = last + 1
+        bits_per_symbol += 1
+    return runs
+
+def read_codes(stream, clear_code, bits_per_symbol):
+    """ Split the code stream into a list of per-CLEAR segments
+        of symbol codes (CLEARs themselves not included).
+    """
+    total_bits = len(stream) * 8
+    padded = np.zeros(len(stream) + 8, dtype=np.uint8)
+    padded[:len(stream)] = np.frombuffer(stream, dtype=np.uint8)
+    # every 64-bit big endian window of the stream, zero-copy
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 8)
+
+    schedule = np.zeros(0, dtype=np.int64)
+    segments = []
+    bitpos = 0
+    previous_is_clear = False
+
+    while True:
+        parts = []
+        n0 = 0
+        # no more codes than there are bits left
+        chunk = max(1, min(4096, (total_bits - bitpos) // bits_per_symbol + 1))
+        eof = False
+
+        while True:
+            # make sure we know the widths of codes n0..n0+chunk
+            if len(schedule) < n0 + chunk:
+                runs = width_schedule(clear_code, bits_per_symbol, 2 * (n0 + chunk))
+                schedule = np.repeat(
+                    np.array([bits for bits, _ in runs], dtype=np.int64),
+                    [repeat for _, repeat in runs])
+
+            widths = schedule[n0:n0+chunk]
+            ends = bitpos + np.cumsum(widths)
+            starts = ends - widths
+
+            # pull the codes out of the 64-bit windows, MSB-first
+            rows = np.minimum(starts >> 3, len(windows) - 1)
+            words = windows[rows].copy().view('>u8').ravel().astype(np.uint64)
+            shifts = (64 - (starts & 7) - widths).astype(np.uint64)
+            masks = (np.uint64(1) << widths.astype(np.uint64)) - np.uint64(1)
+            codes = ((words >> shifts) & masks).astype(np.int32)
+
+            # a code that is cut off by the end of stream is EOF
+            complete = int(np.searchsorted(ends, total_bits, side='right'))
+            clears = np.flatnonzero(codes[:complete] == clear_code)
+            stop = int(clears[0]) if len(clears) else complete
+
+            # a symbol may refer at most to the incomplete one added just before it
+            limit = clear_code + 1 + n0 + np.arange(stop)
+            bad = np.flatnonzero(codes[:stop] >= limit)
+            if len(bad):
+                i = int(bad[0])
+                raise ValueError('invalid LZ code %d (dictionary has %d entries)'
+                    % (codes[i], limit[i]))
+
+            parts.append(codes[:stop])
+
+            if stop < chunk:
+                if stop < complete:
+                    # CLEAR
+                    bitpos = int(ends[stop])
+                else:
+                    eof = True
+                break
+
+            n0 += chunk
+            bitpos = int(ends[-1])
+            chunk *= 2
+
+        segment = np.concatenate(parts)
+
+        if eof:
+            segments.append(segment)
+            break
+
+        if len(segment) == 0 and previous_is_clear:
+            # 2xCLEAR == EOF
+            break
+
+        segments.append(segment)
+        previous_is_clear = True
+
+    return segments
+
+def work_buffer(work, name, size, dtype, fill=None):
+    """ First size items of the array work[name], (re)allocated by
+        fill(n, dtype=dtype) (np.empty by default) when it is missing or too small.
+        Without work, a new array every time.
+    """
+    buf = work.get(name) if work is not None else None
+    if buf is None or len(buf) < size or buf.dtype != dtype:
+        fill = fill or np.empty
+        buf = fill(max(size, 2 * len(buf)) if buf is not None else size, dtype=dtype)
+        if work is not None:
+            work[name] = buf
+    return buf[:size]
+
+def expand_numpy(initial, bits_per_symbol, stream, out=None, work=None):
+    """ Vectorized LZW expansion, returns a uint8 array.
+
+        The dictionary is kept as two arrays: the prefix of each entry
+        (the symbol it extends) and its last byte (the first byte of the
+        symbol that followed it). Symbol lengths, first bytes and finally
+        every output byte are resolved by pointer jumping along the
+        prefix links, so the work per pass is a handful of NumPy gathers.
+
+        out: uint8 array the result is written into (the return value is
+        a view of it). work: dict the output-sized work arrays are kept in
+        between calls. The per-code arrays (a few bytes per code, far
+        fewer than output bytes) are still allocated on every call.
+    """
+    clear_code = len(initial)
+    first_dynamic = clear_code + 1
+    segments = read_codes(stream, clear_code, bits_per_symbol)
+
+    codes = np.concatenate(segments) if segments else np.zeros(0, dtype=np.int32)
+    count = len(codes)
+    if count == 0:
+        return np.zeros(0, dtype=np.uint8) if out is None else out[:0]
+
+    literal = codes < clear_code
+
+    # dictionary entry k of a segment is symbol k of that segment
+    # with the first byte of symbol k+1 appended
+    bases = np.repeat(
+        np.cumsum([0] + [len(seg) for seg in segments[:-1]], dtype=np.int32),
+        [len(seg) for seg in segments])
+    prefix = bases + (codes - first_dynamic)
+    prefix[literal] = np.flatnonzero(literal)
+
+    # symbol lengths and roots (the literal each symbol starts with)
+    depth = (~literal).astype(np.int32)
+    root = prefix.copy()
+    pending = np.flatnonzero(~literal[prefix])
+    while len(pending):
+        hops = root[pending]
+        depth[pending] += depth[hops]
+        root[pending] = root[hops]
+        pending = pending[~literal[root[pending]]]
+    lengths = depth + 1
+
+    table = np.frombuffer(initial, dtype=np.uint8)
+    first = table[codes[root]]
+    last = first[np.minimum(prefix + 1, count - 1)]
+    last[literal] = first[literal]
+
+    starts = np.zeros(count, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    size = int(starts[-1] + lengths[-1])
+    if out is not None and len(out) < size:
+        raise ValueError('output buffer too small: %d bytes needed, %d available'
+            % (size, len(out)))
+
+    # every byte but the last one of a symbol is a copy of the byte
+    # at the same position in its prefix
+    itype = np.int32 if size < (1 << 31) else np.int64
+    identity = work_buffer(work, 'identity', size, itype, fill=np.arange)
+    source = work_buffer(work, 'source', size, itype)
+    np.add(identity, np.repeat((starts[prefix] - starts).astype(itype), lengths), out=source)
+    ends = starts + lengths - 1
+    source[ends] = ends
+    # only the last bytes of symbols are ever read, the rest needn't be cleared
+    values = work_buffer(work, 'values', size, np.uint8)
+    values[ends] = last
+
+    # follow the copies back to the bytes known directly,
+    # only the still unresolved ones on each pass
+    pending = np.flatnonzero(source != identity)
+    while len(pending):
+        hops = source[source[pending]]
+        source[pending] = hops
+        pending = pending[source[hops] != hops]
+
+    if out is None:
+        return values[source]
+    return np.take(values, source, out=out[:size])
+
+class LZDecoder:
+    """ Reusable LZ decoder for decoding many streams back-to-back.
+
+        Like LZWexpand in the map editor, it keeps its dictionary and output
+        arena allocated between calls and only grows them when a stream
+        needs more. On CLEAR, and for every new stream, the dictionary is
+        reset rather than rebuilt, so decoding thousands of small resources
+        (e.g. the FSU sprites) isn't dominated by allocation and GC.
+        The arena is only allocated once a stream goes through the pure
+        Python loop, large streams are expanded by NumPy without it; the
+        NumPy path keeps its output-sized work arrays instead, but still
+        allocates its per-code arrays and the result on every call.
+    """
+
+    def __init__(self, arena_size=1000000, dictionary_size=4096):
+        self.arena_size = arena_size
+        self.arena = bytearray()
+        # output-sized NumPy work arrays of expand_numpy
+        self.work = {}
+        # dictionary entry k == output offset where symbol k started
+        self.starts = [0] * dictionary_size
+
+    def decode_into(self, src, dst):
+        """ Decode the LZ stream src into the writable buffer dst.
+            Returns the number of bytes written.
+
+            Large streams are expanded by NumPy straight into dst; small
+            ones go through the arena and are copied.
+        """
+        initial, bits_per_symbol, stream = parse_header(src)
+        if np is not None and len(stream) >= NUMPY_MIN_STREAM:
+            out = np.frombuffer(dst, dtype=np.uint8)
+            return len(expand_numpy(initial, bits_per_symbol, stream, out=out, work=self.work))
+
+        # expand() may (re)allocate the arena, view it only afterwards
+        size = self.expand(initial, bits_per_symbol, stream)
+        data = memoryview(self.arena)[:size]
+        if len(data) > len(dst):
+            raise ValueError('output buffer too small: %d bytes needed, %d available'
+                % (len(data), len(dst)))
+
+        with memoryview(dst) as view:
+            view[:len(data)] = data
+        return len(data)
+
+    def decode(self, src):
+        """ Decode the LZ stream src into a new bytes object. """
+        return bytes(self.decode_view(src))
+
+    def decode_view(self, src):
+        """ Decode the LZ stream src and return a buffer with the result.
+
+            The buffer may be a view of the arena, it's only valid
+            until the next call.
+        """
+        initial, bits_per_symbol, stream = parse_header(src)
+
+        # NumPy setup costs more than it saves on tiny streams
+        if np is not None and len(stream) >= NUMPY_MIN_STREAM:
+            return expand_numpy(initial, bits_per_symbol, stream, work=self.work)
+
+        size = self.expand(initial, bits_per_symbol, stream)
+        return memoryview(self.arena)[:size]
+
+    def expand(self, initial, bits_per_symbol, stream):
+        """ Pure Python LZW expansion into the arena,
+            returns the number of bytes written.
+
+            Every dictionary entry is a symbol followed by the first letter
+            of the next symbol -- and since symbols are written to the output
+            back-to-back, the entry is always a contiguous run of the output.
+            So the dictionary is just the output offsets where each symbol
+            started.
+        """
+        clear_code = len(initial)
+        first_dynamic = clear_code + 1
+        clear_bits_per_symbol = bits_per_symbol
+
+        if not self.arena:
+            self.arena = bytearray(self.arena_size)
+
+        # pad to whole 32-bit words for the bit accumulator refills
+        src = bytes(stream)
+        bits_left = len(src) * 8
+        src += bytes(-len(src) % 4)
+        words = struct.unpack('>%dI' % (len(src) // 4), src)
+
+        starts = self.starts
+        count = 0
+        # bump the width once this many symbols have been added
+        grow_at = (1 << bits_per_symbol) - first_dynamic - 1
+        previous_is_clear = False
+
+        acc = 0
+        acc_bits = 0
+        word_index = 0
+
+        view = memoryview(self.arena)
+        pos = 0
+
+        try:
+            while True:
+                # read symbol
+                if bits_left < bits_per_symbol:
+                    break  # EOF
+                bits_left -= bits_per_symbol
+
+                if acc_bits < bits_per_symbol:
+                    acc = (acc << 32) | words[word_index]
+                    word_index += 1
+                    acc_bits += 32
+
+                acc_bits -= bits_per_symbol
+                i = acc >> acc_bits
+                acc &= (1 << acc_bits) - 1
+
+                start = pos
+
+                if i < clear_code:
+                    if pos >= len(view):
+                        view = self.grow_arena(view, pos + 1)
+                    view[pos] = initial[i]
+                    pos += 1
+                elif i == clear_code:
+                    if previous_is_clear:
+                        # this is EOF
+                        break
+
+                    # just a CLEAR
+                    count = 0
+                    bits_per_symbol = clear_bits_per_symbol
+                    grow_at = (1 << bits_per_symbol) - first_dynamic - 1
+                    previous_is_clear = True
+                    continue
+                else:
+                    k = i - first_dynamic
+                    last = count - 1
+                    if k < last:
+                        offset = starts[k]
+                        pos += starts[k+1] + 1 - offset
+                        if pos > len(view):
+                            view = self.grow_arena(view, pos)
+                        view[start:pos] = view[offset:offset+pos-start]
+                    elif k == last:
+                        # This is a special case in LZW decompression:
+                        # we're emitting a symbol that we haven't completed yet.
+                        # Whenever this happens, the last letter must be the same as the first.
+                        offset = starts[k]
+                        pos += start - offset + 1
+                        if pos > len(view):
+                            view = self.grow_arena(view, pos)
+                        view[start:pos-1] = view[offset:start]
+                        view[pos-1] = view[offset]
+                    else:
+                        raise ValueError('invalid LZ code %d (dictionary has %d entries)'
+                            % (i, first_dynamic + count))
+
+                previous_is_clear = False
+
+                # add an incomplete current symbol
+                if count == len(starts):
+                    starts.extend([0] * count)
+                starts[count] = start
+                count += 1
+
+                # check if we need more bits per symbol from now on
+                if count > grow_at:
+                    bits_per_symbol += 1
+                    grow_at = (1 << bits_per_symbol) - first_dynamic - 1
+        finally:
+            view.release()
+
+        return pos
+
+    def grow_arena(self, view, size):
+        """ Grow the arena to hold at least size bytes,
+            returns a new view of it.
+        """
+        view.release()
+        self.arena.extend(bytes(max(size, 2 * len(self.arena)) - len(self.arena)))
+        return memoryview(self.arena)
+
+# one decoder per thread, reused by unpack_bytes
+_local = threading.local()
+
+def shared_decoder():
+    """ This thread's LZDecoder, created on first use. """
+    decoder = getattr(_local, 'decoder', None)
+    if decoder is None:
+        decoder = _local.decoder = LZDecoder(arena_size=1 << 16)
+    return decoder
+
+def unpack_bytes(data):
+    """ Decode a whole LZ stream held in memory.
+
+        Produces exactly the same bytes as b''.join(iter_unpack(f)),
+        but without the per-byte file reads and per-symbol bytes objects.
+        Uses this thread's shared decoder, so repeated calls don't
+        allocate a new arena and dictionary each time.
+    """
+    return shared_decoder().decode(data)
+
 def unpack(f):
-    return b''.join(iter_unpack(f))
+    return unpack_bytes(f.read())
 
 if __name__ == '__main__':
     with open(sys.argv[1], 'rb') as f:
-        for chunk in iter_unpack(f):
-            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.write(unpack(f))
@@ -1,33 +1,109 @@
 #!/usr/bin/env python3
 
 import sys
-import struct
+import json
 import logging
 
+import numpy as np
+
 import unlz
 import utils
 
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger('unsave')
 
-def main():
-    with open(sys.argv[1], 'rb') as f:
-        lz = unlz.LZFile(f)
+# uint16_t[90] = header
+HEADER_DTYPE = np.dtype(('<u2', (90,)))
+HEADER_SIZE = HEADER_DTYPE.itemsize
+
+# char[30] = name, zero-padded
+# uint8_t[36] = not decoded yet
+RECORD_DTYPE = np.dtype([('name', 'S30'), ('data', 'u1', (36,))])
+RECORD_SIZE = RECORD_DTYPE.itemsize
+
+# records per array yielded by iter_records()
+RECORD_BATCH = 4096
+
+class SaveGame:
+    """ Decompressed save, the records as one structured array (a column per field).
+
+        Trailing bytes that don't make up a whole record are kept in tail.
+    """
+
+    def __init__(self, header, records, tail=b''):
+        self.header = header
+        self.records = records
+        self.tail = tail
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER_SIZE:
+            raise ValueError('save is too short (%d bytes), the header alone is %d' % (len(data), HEADER_SIZE))
 
-        header = struct.unpack('<90H', lz.read(180))
-        print('header: ', header)
+        header = np.frombuffer(data, dtype=HEADER_DTYPE.base, count=HEADER_DTYPE.shape[0])
+        count = (len(data) - HEADER_SIZE) // RECORD_SIZE
+        records = np.frombuffer(data, dtype=RECORD_DTYPE, count=count, offset=HEADER_SIZE)
+        tail = bytes(data[HEADER_SIZE + count*RECORD_SIZE:])
+        log.debug('%d records, %d bytes of tail' % (count, len(tail)))
 
-        while True:
-            buf = lz.read(66)
-            if buf is None:
-                break
+        return cls(header, records, tail)
 
-            name_raw, garbage = struct.unpack('<30s36s', buf)
-            name = utils.from_c_string(name_raw)
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(unlz.unpack(f))
+
+    def __len__(self):
+        return len(self.records)
+
+    def names(self):
+        return utils.from_c_strings(self.records, 30, stride=RECORD_SIZE)
+
+    def to_dict(self):
+        return {
+            'header': self.header.tolist(),
+            'records': [
+                {'name': name, 'data': data.tobytes().hex()}
+                for name, data in zip(self.names(), self.records['data'])
+            ],
+            'tail': self.tail.hex(),
+        }
+
+    def to_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+def read_header(lz):
+    """ Header of a save opened as unlz.LZFile. """
+    buf = lz.read(HEADER_SIZE)
+    if len(buf) < HEADER_SIZE:
+        raise ValueError('save is too short, no header')
+    return np.frombuffer(buf, dtype=HEADER_DTYPE.base)
+
+def iter_records(lz, batch=RECORD_BATCH):
+    """ Structured arrays of up to batch records each.
+        lz is an unlz.LZFile positioned past the header; LZFile decodes the
+        whole save into memory, this only avoids building one big array.
+    """
+    while True:
+        buf = lz.read(batch * RECORD_SIZE)
+        count = len(buf) // RECORD_SIZE
+        if count:
+            yield np.frombuffer(buf, dtype=RECORD_DTYPE, count=count)
+        if len(buf) < batch * RECORD_SIZE:
+            break
+
+def main():
+    # decoded once, for the listing and the JSON export
+    save = SaveGame.load(sys.argv[1])
 
-            print('%s: %d (%s)' % (name, len(garbage), garbage))
+    print('header: ', tuple(save.header.tolist()))
+    for name, data in zip(save.names(), save.records['data']):
+        print('%s: %d (%s)' % (name, len(data), data.tobytes()))
 
-            ## UNFINISHED ##
+    # optionally also export everything as JSON
+    if len(sys.argv) > 2:
+        save.to_json(sys.argv[2])
 
 if __name__ == '__main__':
     main()
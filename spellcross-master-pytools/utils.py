@@ -1,3 +1,10 @@
+import codecs
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # table taken from:
 # https://stackoverflow.com/a/17747103
 CP_852 = [
@@ -40,8 +47,11 @@ CP_852 = [
     '\u207F', '\u00B2', '\u25A0', '\u00A0',
 ]
 
+# the same table as a charmap codec decoding table, for bulk decoding in C
+CP_852_DECODING_TABLE = ''.join(CP_852)
+
 def from_cp852(bs):
-    return ''.join(CP_852[code] for code in bs)
+    return codecs.charmap_decode(bs, 'strict', CP_852_DECODING_TABLE)[0]
 
 def from_c_string(bs, encoding='cp852'):
     bs = bs.partition(b'\0')[0]
@@ -50,3 +60,36 @@ def from_c_string(bs, encoding='cp852'):
         return from_cp852(bs)
     else:
         return bs.decode(encoding)
+
+def from_c_strings(buf, width, stride=None, offset=0, count=None, encoding='cp852'):
+    """ Decode count fixed-width C string fields, one per record of stride
+        bytes starting at offset (like the '13s' names in a FS directory),
+        the same as from_c_string() on each of them.
+    """
+    stride = stride or width
+    if count is None:
+        with memoryview(buf) as view:
+            count = (view.nbytes - offset) // stride
+
+    if count <= 0:
+        return []
+
+    if np is None:
+        with memoryview(buf) as view, view.cast('B') as view:
+            return [from_c_string(bytes(view[offset + i*stride:offset + i*stride + width]), encoding)
+                for i in range(count)]
+
+    records = np.frombuffer(buf, dtype=np.uint8, count=count*stride, offset=offset)
+    fields = records.reshape(count, stride)[:, :width]
+
+    # length up to the first NUL, or the whole field
+    nul = fields == 0
+    lengths = np.where(nul.any(axis=1), nul.argmax(axis=1), width).tolist()
+
+    if encoding != 'cp852':
+        raw = fields.tobytes()
+        return [raw[i*width:i*width + n].decode(encoding) for i, n in enumerate(lengths)]
+
+    # one byte is one character, so the decoded buffer slices like the raw one
+    text = from_cp852(fields.tobytes())
+    return [text[i*width:i*width + n] for i, n in enumerate(lengths)]